@@ -3,10 +3,13 @@ from revChatGPT.V3 import Chatbot
 import pandas as pd
 import string
 import re
-from utils.the_graph import post_query, parse_results
-from utils.prompts import protocol_selection_prompt, query_prompt
-from utils.urls import URLS
-from utils.schemas import SCHEMAS
+from utils.export import FORMATS, available_formats, export_file
+from utils.charts import RESAMPLE_RULES, chart_frame
+from utils.llm import LLM_CACHE
+from utils.cache import ResponseCache
+from utils.refresh import IncrementalRefresher
+from utils.pipeline import Pipeline, PipelineResult
+from utils.tracing import TRACER
 
 IMAGE = "https://media.tenor.com/Rooi8rhW1CkAAAAi/web3-crypto.gif"
 
@@ -27,11 +30,32 @@ if 'df' not in st.session_state:
 if 'df_exists' not in st.session_state:
     st.session_state.df_exists = False
 
+if 'frames' not in st.session_state:
+    st.session_state.frames = {}
+
+if 'exports' not in st.session_state:
+    st.session_state.exports = {}
+
+if 'charts' not in st.session_state:
+    st.session_state.charts = {}
+
+if 'trace' not in st.session_state:
+    st.session_state.trace = None
+
+if 'refresh' not in st.session_state:
+    st.session_state.refresh = False
+
 def reset_data():
     st.session_state.protocol = ''
     st.session_state.query = ''
     st.session_state.df = pd.DataFrame()
     st.session_state.df_exists = False
+    st.session_state.frames = {}
+    st.session_state.exports = {}
+    st.session_state.charts = {}
+
+def refresh_data():
+    st.session_state.refresh = True
 
 a, b = st.columns([1,9])
 a.image(IMAGE, width=110)
@@ -39,9 +63,16 @@ b.title("THE AI GRAPH\nEasy accessable by anyone without graphql queries, Here i
 
 st.markdown('##')
 
-@st.experimental_memo
-def convert_df(df):
-   return df.to_csv(index=False).encode('utf-8')
+llm_stats = LLM_CACHE.stats()
+st.sidebar.caption('LLM cache: %(hits)d hits, %(misses)d misses, %(saved_seconds).1fs saved' % llm_stats)
+
+@st.experimental_singleton
+def get_response_cache():
+    return ResponseCache(disk_dir='.cache/responses')
+
+@st.experimental_singleton
+def get_refresher():
+    return IncrementalRefresher()
 
 col1, col2 = st.columns([4,6])
 with col2:
@@ -64,58 +95,84 @@ with col1:
             on_click=reset_data
         )
 
-if st.session_state.df_exists or (user_input and submit_button_1):
-    chatbot = Chatbot(api_key=st.secrets["api"])
-    if not st.session_state.protocol:
-        with st.spinner(text='Detecting the protocol...'):
-            protocol = list(chatbot.ask(
-                protocol_selection_prompt%(user_input)
-            ))
-            st.info(''.join(protocol))
+one_shot = st.sidebar.checkbox('One-shot mode', value=True, help='Detect the protocol and write the query in one LLM call')
+show_timings = st.sidebar.checkbox('Stage timings', help='Time, bytes and rows of every stage of the last request')
 
-        # # for char in string.punctuation:
-        # #     protocol = protocol.replace(char, '')
-        #re.sub('[^A-Za-z0-9]+', '', string)
+if st.session_state.df_exists or (user_input and submit_button_1):
+    pipeline = Pipeline(
+        lambda: Chatbot(api_key=st.secrets["api"]),
+        transport=lambda url, query, cache=None: get_refresher().refresh(url, query, st.session_state.protocol, cache=cache),
+        response_cache=get_response_cache(),
+        one_shot=one_shot
+    )
+    result = PipelineResult(user_input, st.session_state.protocol, st.session_state.query)
+    if st.session_state.refresh:
+        st.session_state.refresh = False
+        st.session_state.df_exists = False
+    if not st.session_state.df_exists:
+        TRACER.start_trace(user_input)
 
-        protocol = ''.join(filter(str.isalnum, protocol)).lower()
-        st.session_state.protocol = protocol
+    if not st.session_state.protocol:
+        if pipeline.wants_one_shot(user_input):
+            text = 'Detecting the protocol and writing the query...'
+        else:
+            text = 'Detecting the protocol...'
+        with st.spinner(text=text):
+            answer = st.empty()
+            pipeline.detect(result, on_token=answer.info)
+            answer.info(result.protocol)
 
-    schema = SCHEMAS[st.session_state.protocol]
+        st.session_state.protocol = result.protocol
 
-    chatbot = Chatbot(api_key= st.secrets["api"])
     if not st.session_state.query:
         with st.spinner(text='Writing the query...'):
-            query = chatbot.ask(
-                query_prompt%(st.session_state.protocol, user_input, schema)
-            )
-            st.info(query)
-
-        st.session_state.query = query[query.find('{'): query.rfind('}') + 1]
+            answer = st.empty()
+            pipeline.write(result, on_token=answer.info)
+            answer.info(result.query)
+
+        if not result.ok:
+            st.error(result.error)
+            st.stop()
+        st.session_state.query = result.query
     with st.expander(':scroll: Query'):
         st.text(st.session_state.query)
+        if st.session_state.frames:
+            st.button('Refresh', help='Fetch only rows newer than the last result', on_click=refresh_data)
 
     if not st.session_state.df_exists:
         with st.spinner(text='Sending the request...'):
-            results = post_query(
-                URLS[st.session_state.protocol],
-                st.session_state.query
-                )
-            if 'data' in results:
-                for key, value in results['data'].items():
-                    st.session_state.df = pd.DataFrame(parse_results(value))
+            pipeline.fetch(result)
+            if result.ok:
+                pipeline.build_frames(result)
+                st.session_state.frames = result.frames
+                st.session_state.df = next(iter(st.session_state.frames.values()), pd.DataFrame())
+                st.session_state.exports = {}
+                st.session_state.charts = {}
                 st.session_state.df_exists = True
             else:
-                st.text(results)
+                st.text(result.response)
+        st.session_state.trace = TRACER.finish_trace()
+
+    entity = next(iter(st.session_state.frames), '')
+    if len(st.session_state.frames) > 1:
+        entity = st.selectbox('Result:', list(st.session_state.frames))
+        st.session_state.df = st.session_state.frames[entity]
 
     with st.expander(':scroll: Dataframe', expanded=True):
         st.dataframe(st.session_state.df)
-        data = convert_df(st.session_state.df)
+        export_format = st.radio('Format:', available_formats(), horizontal=True)
+        extension, mime = FORMATS[export_format]
+        # Built once per result and format, reruns reuse the finished bytes.
+        if (entity, export_format) not in st.session_state.exports:
+            with export_file(st.session_state.df, export_format) as exported:
+                st.session_state.exports[(entity, export_format)] = exported.read()
+        data = st.session_state.exports[(entity, export_format)]
         st.download_button(
         "Press to Download",
         data,
-        "file.csv",
-        "text/csv",
-        key='download-csv'
+        "%s.%s" % (entity or 'file', extension),
+        mime,
+        key='download-' + extension
         )
 
     st.markdown('#')
@@ -124,19 +181,37 @@ if st.session_state.df_exists or (user_input and submit_button_1):
         chart_types = ['Line chart', 'Bar chart']
         chart_type = a.radio('Select one of the following chart types:', chart_types)
         columns = b.multiselect('Select the columns for your plot:', st.session_state.df.columns)
+        resample = c.selectbox('Resample by time:', ['None'] + list(RESAMPLE_RULES))
+        method = c.radio('Downsampling:', ['LTTB', 'Min/max'], horizontal=True)
         submit_button_2 = st.form_submit_button(label='Submit')
 
     st.markdown('#')
 
-    if submit_button_2:
-        if columns[0].lower() == 'timestamp':
-            st.session_state.df[columns[0]] = pd.to_datetime(st.session_state.df[columns[0]], unit='s')
-        display_df = st.session_state.df.set_index(columns[0])
-        display_df = display_df[columns[1:]]
-        for col in display_df.columns:
-            display_df[col] = display_df[col].astype(float)
-        if chart_type == 'Line chart':
-            st.line_chart(display_df)
-
-        if chart_type == 'Bar chart':
-            st.bar_chart(display_df)
+    if submit_button_2 and len(columns) > 1:
+        # Prepared once per result and column choice, later reruns only redraw it.
+        key = (entity, tuple(columns), resample, method)
+        with TRACER.span('chart', protocol=st.session_state.protocol, entity=entity) as span:
+            if key not in st.session_state.charts:
+                st.session_state.charts[key] = chart_frame(
+                    st.session_state.df,
+                    columns,
+                    resample=None if resample == 'None' else resample,
+                    method='lttb' if method == 'LTTB' else 'minmax'
+                )
+            display_df = st.session_state.charts[key]
+            span.set(rows=len(display_df))
+            if chart_type == 'Line chart':
+                st.line_chart(display_df)
+
+            if chart_type == 'Bar chart':
+                st.bar_chart(display_df)
+
+if show_timings:
+    trace = st.session_state.trace
+    if trace is None:
+        st.sidebar.caption('No request yet')
+    else:
+        st.sidebar.caption('%s: %.0f ms' % (trace.name, trace.seconds * 1000))
+        timings = pd.DataFrame(trace.rows(), columns=['stage', 'labels', 'ms', 'bytes', 'rows'])
+        timings['labels'] = timings['labels'].map(lambda labels: ', '.join('%s=%s' % item for item in labels.items()))
+        st.sidebar.dataframe(timings)
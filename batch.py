@@ -0,0 +1,132 @@
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from utils.cache import ResponseCache
+from utils.chatbots import chatbot_factory
+from utils.executor import PER_ENDPOINT, limit_endpoints
+from utils.export import FORMATS, WRITERS
+from utils.limiter import INITIAL_CONCURRENCY, LIMITERS, MAX_CONCURRENCY, RATE
+from utils.pipeline import STAGES, Pipeline, PipelineResult
+from utils.the_graph import post_query
+from utils.tracing import TRACER
+
+CONCURRENCY = 8
+SLUG_CHARS = 48
+SUMMARY_COLUMNS = ['index', 'request', 'protocol', 'status', 'rows', 'files'] + [
+    stage + '_ms' for stage in STAGES + ('export',)] + ['total_ms', 'query', 'error']
+
+
+def read_requests(source):
+    # One request per line, blank lines and # comments are skipped.
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith('#')]
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:SLUG_CHARS].rstrip('-') or 'request'
+
+def write_frames(result, index, out_dir, export_format):
+    extension = FORMATS[export_format][0]
+    name = '%03d-%s' % (index, slug(result.user_input))
+    files = []
+    for key, df in result.frames.items():
+        path = os.path.join(out_dir, '%s.%s' % (name if len(result.frames) == 1 else name + '-' + key, extension))
+        with open(path, 'wb') as f:
+            WRITERS[export_format](df, f)
+        files.append(path)
+    return files
+
+def run_request(pipeline, index, request, out_dir, export_format):
+    result = PipelineResult(request)
+    files = []
+    try:
+        result = pipeline.run(request)
+        if result.ok:
+            with pipeline.stage(result, 'export'):
+                files = write_frames(result, index, out_dir, export_format)
+    except Exception as e:
+        result.error = '%s: %s' % (type(e).__name__, e)
+    row = {
+        'index': index,
+        'request': request,
+        'protocol': result.protocol,
+        'status': 'ok' if result.ok else 'error',
+        'rows': sum(len(df) for df in result.frames.values()),
+        'files': ';'.join(os.path.basename(path) for path in files),
+    }
+    for stage in STAGES + ('export',):
+        row[stage + '_ms'] = round(result.timings.get(stage, 0.0) * 1000, 1)
+    row['total_ms'] = round(result.total * 1000, 1)
+    row['query'] = result.query
+    row['error'] = result.error
+    return row
+
+def run_batch(requests, pipeline, out_dir, export_format='CSV', concurrency=CONCURRENCY, progress=None):
+    os.makedirs(out_dir, exist_ok=True)
+    rows = []
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='batch') as pool:
+        futures = [pool.submit(run_request, pipeline, index, request, out_dir, export_format)
+                   for index, request in enumerate(requests, 1)]
+        for future in as_completed(futures):
+            rows.append(future.result())
+            if progress:
+                progress(rows[-1], len(rows), len(requests))
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).sort_values('index', ignore_index=True)
+    summary.to_csv(os.path.join(out_dir, 'summary.csv'), index=False)
+    with open(os.path.join(out_dir, 'metrics.prom'), 'w', encoding='utf-8') as f:
+        f.write(TRACER.prometheus() + LIMITERS.prometheus())
+    return summary
+
+def print_progress(row, done, total):
+    print('[%d/%d] %-5s %8.1f ms  %s' % (done, total, row['status'], row['total_ms'], row['request']), file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a file of natural language requests through the pipeline and writes one file per result.')
+    parser.add_argument('source', help="file with one request per line, '-' reads stdin")
+    parser.add_argument('--out', default='results', help='output directory, summary.csv is written there too')
+    parser.add_argument('--format', default='CSV', type=lambda value: {k.lower(): k for k in FORMATS}.get(value.lower(), value),
+                        choices=list(FORMATS))
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='requests in flight at once')
+    parser.add_argument('--per-endpoint', type=int,
+                        help='most subgraph requests in flight per endpoint, %s by default' % MAX_CONCURRENCY)
+    parser.add_argument('--rate', type=float, help='subgraph requests per second per endpoint, %s by default' % RATE)
+    parser.add_argument('--api-key', help='OpenAI key, OPENAI_API_KEY by default')
+    parser.add_argument('--mock', type=float, metavar='LATENCY', help='use the offline mock LLM with this latency in seconds')
+    parser.add_argument('--no-one-shot', dest='one_shot', action='store_false')
+    parser.add_argument('--trace', metavar='FILE', help='append every stage span to FILE as JSON lines')
+    args = parser.parse_args(argv)
+    if args.rate:
+        LIMITERS.configure(rate=args.rate, burst=max(int(args.rate * 2), 1))
+    if args.per_endpoint:
+        # The adaptive limiter already caps each endpoint, a fixed cap below its maximum would hide its growth.
+        LIMITERS.configure(maximum=args.per_endpoint, initial=min(INITIAL_CONCURRENCY, args.per_endpoint))
+    transport = post_query if LIMITERS.enabled else limit_endpoints(post_query, args.per_endpoint or PER_ENDPOINT)
+    if args.trace:
+        TRACER.jsonl_path = args.trace
+
+    requests = read_requests(args.source)
+    pipeline = Pipeline(
+        chatbot_factory(args.api_key, args.mock),
+        transport=transport,
+        response_cache=ResponseCache(),
+        one_shot=args.one_shot,
+    )
+    start = time.perf_counter()
+    summary = run_batch(requests, pipeline, args.out, args.format, args.concurrency, print_progress)
+    elapsed = time.perf_counter() - start
+    failed = int((summary['status'] != 'ok').sum()) if len(summary) else 0
+    print('%d requests, %d failed, %.1f s wall, %.2f requests/s, summary in %s' % (
+        len(summary), failed, elapsed, len(summary) / elapsed if elapsed else 0.0, os.path.join(args.out, 'summary.csv')))
+    if len(summary):
+        print(summary[['index', 'status', 'rows'] + [s + '_ms' for s in STAGES + ('export',)] + ['total_ms']].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import random
+import sys
+import time
+import pandas as pd
+from utils.frames import results_frame
+from utils.the_graph import parse_results
+
+ROWS = 10000
+REPEAT = 5
+
+
+def swap_rows(count, seed=0):
+    rng = random.Random(seed)
+    tokens = [
+        {'id': '0x%040x' % rng.getrandbits(160), 'symbol': symbol, 'decimals': decimals}
+        for symbol, decimals in (('WETH', 18), ('USDC', 6), ('DAI', 18), ('WBTC', 8))
+    ]
+    rows = []
+    for index in range(count):
+        token_in, token_out = rng.sample(tokens, 2)
+        rows.append({
+            'id': 'swap-0x%064x-%d' % (rng.getrandbits(256), index),
+            'timestamp': str(1680000000 + index * 12),
+            'amountIn': str(rng.getrandbits(70)),
+            'amountInUSD': '%.6f' % (rng.random() * 1e5),
+            'amountOut': str(rng.getrandbits(70)),
+            'tokenIn': dict(token_in),
+            'tokenOut': dict(token_out),
+            'pool': {'id': '0x%040x' % rng.getrandbits(160), 'name': 'Uniswap V3 %s/%s' % (token_in['symbol'], token_out['symbol'])},
+        })
+    return rows
+
+def best_of(function, repeat=REPEAT):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(rows=ROWS):
+    data = swap_rows(rows)
+    flat_time, expected = best_of(lambda: pd.DataFrame(parse_results(data)))
+    columnar_time, frame = best_of(lambda: results_frame(data))
+    pd.testing.assert_frame_equal(frame, expected)
+    print('rows: %d, columns: %d' % (len(frame), len(frame.columns)))
+    print('parse_results + DataFrame: %8.1f ms' % (flat_time * 1000))
+    print('results_frame:             %8.1f ms (%.1fx)' % (columnar_time * 1000, flat_time / columnar_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
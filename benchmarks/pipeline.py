@@ -0,0 +1,80 @@
+import argparse
+import json
+from benchmarks.replay import load_recording, percentile, recorded_protocols, scaled_rows
+from utils.cache import LLMCache
+from utils.mock_llm import MockChatbot
+from utils.pipeline import STAGES, Pipeline
+from utils.schemas import SCHEMAS
+from utils.stand_in import StandInSubgraph
+
+REQUESTS = [
+    'show me the latest 50 swaps on uniswap',
+    'show me the latest 50 swaps on balancer',
+    'show the latest 20 orders on decentraland',
+    'show me the latest 50 supplies on aave',
+]
+ROUNDS = 5
+ROWS = 1000
+LLM_LATENCY = 0.2
+TOKEN_LATENCY = 0.002
+LATENCY = 0.02
+
+
+def stand_ins(rows, latency):
+    servers = {}
+    for protocol in recorded_protocols():
+        if protocol in SCHEMAS:
+            _, root, recorded = load_recording(protocol)
+            servers[protocol] = StandInSubgraph({root: scaled_rows(recorded, rows)}, latency=latency)
+    return servers
+
+def bench_pipeline(requests=REQUESTS, rounds=ROUNDS, rows=ROWS, llm_latency=LLM_LATENCY, token_latency=TOKEN_LATENCY,
+                   latency=LATENCY, cache=False):
+    servers = stand_ins(rows, latency)
+    for server in servers.values():
+        server.start()
+    try:
+        pipeline = Pipeline(
+            lambda: MockChatbot(llm_latency, token_latency),
+            urls={protocol: server.url for protocol, server in servers.items()},
+            llm_cache=LLMCache(max_entries=1024 if cache else 0),
+        )
+        timings = {stage: [] for stage in STAGES + ('total',)}
+        for _ in range(rounds):
+            for request in requests:
+                result = pipeline.run(request)
+                if not result.ok:
+                    raise RuntimeError('%s: %s' % (request, result.error))
+                for stage, seconds in result.timings.items():
+                    timings[stage].append(seconds)
+                timings['total'].append(result.total)
+    finally:
+        for server in servers.values():
+            server.stop()
+    return {
+        stage: {'p50_ms': percentile(values, 0.5) * 1000, 'p95_ms': percentile(values, 0.95) * 1000, 'runs': len(values)}
+        for stage, values in timings.items() if values
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Times the whole request pipeline offline with the mock LLM and stand-in subgraphs.')
+    parser.add_argument('requests', nargs='*', help='natural language requests, a built-in set by default')
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--rows', type=int, default=ROWS, help='rows each stand-in holds per entity')
+    parser.add_argument('--llm-latency', type=float, default=LLM_LATENCY, help='seconds before the first token')
+    parser.add_argument('--token-latency', type=float, default=TOKEN_LATENCY, help='seconds between tokens')
+    parser.add_argument('--latency', type=float, default=LATENCY, help='seconds each stand-in waits before answering')
+    parser.add_argument('--cache', action='store_true', help='keep the LLM cache between rounds')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    report = bench_pipeline(args.requests or REQUESTS, args.rounds, args.rows, args.llm_latency, args.token_latency,
+                            args.latency, args.cache)
+    if args.json:
+        print(json.dumps(report))
+        return
+    for stage, row in report.items():
+        print('%-10s p50 %8.1f ms  p95 %8.1f ms  (%d runs)' % (stage, row['p50_ms'], row['p95_ms'], row['runs']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.parse_results import best_of
+from utils.dtypes import column_types
+from utils.export import available_formats, export_file
+from utils.frames import result_frames
+from utils.graphql import parse
+from utils.limiter import LIMITERS
+from utils.schemas import SCHEMAS
+from utils.stand_in import StandInSubgraph
+from utils.the_graph import parse_results, post_query
+from utils.urls import URLS, override_urls
+
+RECORDINGS = os.path.join(os.path.dirname(__file__), 'recordings')
+ROWS = 1000
+LATENCY = 0.02
+REQUESTS = 50
+CONCURRENCY = 8
+
+
+def recorded_protocols():
+    return sorted(name[:-5] for name in os.listdir(RECORDINGS) if name.endswith('.json'))
+
+def load_recording(protocol):
+    with open(os.path.join(RECORDINGS, protocol + '.json'), encoding='utf-8') as f:
+        recording = json.load(f)
+    root = parse(recording['query']).fields[0].key
+    return recording['query'], root, recording['response']['data'][root]
+
+def scaled_rows(rows, count):
+    # Repeats the recorded rows under fresh ids until the payload has the requested size.
+    scaled = []
+    for index in range(count):
+        row = rows[index % len(rows)]
+        scaled.append(row if index < len(rows) else dict(row, id='%s-%d' % (row['id'], index // len(rows))))
+    return scaled
+
+def replay_server(root, rows, latency):
+    # Encoded once, the stand-in then only adds the configured latency to every request.
+    content = json.dumps({'data': {root: rows}}).encode('utf-8')
+    return StandInSubgraph(handler=lambda query: (200, content), latency=latency), len(content)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def time_requests(url, query, requests, concurrency):
+    def timed(_):
+        start = time.perf_counter()
+        result = post_query(url, query)
+        if 'data' not in result:
+            raise RuntimeError('Replay request failed: %s' % (result,))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed, range(requests)))
+    return time.perf_counter() - start, latencies
+
+def bench_protocol(protocol, rows=ROWS, latency=LATENCY, requests=REQUESTS, concurrency=CONCURRENCY):
+    query, root, recorded = load_recording(protocol)
+    data = scaled_rows(recorded, rows)
+    server, size = replay_server(root, data, latency)
+    report = {'protocol': protocol, 'rows': rows, 'payload_bytes': size}
+    with server:
+        previous = override_urls({protocol: server.url})
+        try:
+            post_query(URLS[protocol], query)
+            elapsed, latencies = time_requests(URLS[protocol], query, requests, concurrency)
+        finally:
+            override_urls(previous)
+    report['post_query'] = {
+        'requests_per_second': requests / elapsed,
+        'mb_per_second': requests * size / elapsed / 1e6,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+    seconds, _ = best_of(lambda: parse_results(data))
+    report['parse_results'] = {'ms': seconds * 1000, 'rows_per_second': rows / seconds}
+    types = column_types(protocol, query) if protocol in SCHEMAS else None
+    seconds, frames = best_of(lambda: result_frames({root: data}, types))
+    report['frames'] = {'ms': seconds * 1000, 'rows_per_second': rows / seconds}
+    for fmt in available_formats():
+        seconds, exported = best_of(lambda: export_file(frames[root], fmt))
+        exported.seek(0, os.SEEK_END)
+        report['export_' + fmt.lower()] = {'ms': seconds * 1000, 'rows_per_second': rows / seconds, 'bytes': exported.tell()}
+    return report
+
+def print_report(report):
+    print('%s: %d rows, %.1f kB per response' % (report['protocol'], report['rows'], report['payload_bytes'] / 1000))
+    requests = report['post_query']
+    print('  post_query      %8.1f req/s %8.1f MB/s   p50 %6.1f ms  p95 %6.1f ms  p99 %6.1f ms' % (
+        requests['requests_per_second'], requests['mb_per_second'], requests['p50_ms'], requests['p95_ms'], requests['p99_ms']))
+    for stage in [key for key in report if key in ('parse_results', 'frames') or key.startswith('export_')]:
+        print('  %-15s %8.1f ms   %10.0f rows/s' % (stage, report[stage]['ms'], report[stage]['rows_per_second']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replays recorded subgraph responses from a local stand-in and times each pipeline stage.')
+    parser.add_argument('protocols', nargs='*', help='protocols to run, all recordings by default')
+    parser.add_argument('--rows', type=int, default=ROWS, help='rows per response')
+    parser.add_argument('--latency', type=float, default=LATENCY, help='seconds the stand-in waits before answering')
+    parser.add_argument('--requests', type=int, default=REQUESTS)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--json', action='store_true', help='print one JSON report per protocol')
+    parser.add_argument('--rate', type=float, help='apply the endpoint limiter at this many requests per second, off by default')
+    args = parser.parse_args(argv)
+    if args.rate:
+        LIMITERS.configure(rate=args.rate, burst=max(int(args.rate * 2), 1))
+    else:
+        LIMITERS.enabled = False
+    for protocol in args.protocols or recorded_protocols():
+        report = bench_protocol(protocol, args.rows, args.latency, args.requests, args.concurrency)
+        if args.json:
+            print(json.dumps(report), flush=True)
+        else:
+            print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.cache import LLMCache, ResponseCache, coalesce
+from utils.chatbots import chatbot_factory
+from utils.export import iter_csv
+from utils.limiter import LIMITERS
+from utils.pipeline import Pipeline
+from utils.the_graph import post_query
+
+HOST = '127.0.0.1'
+PORT = 8000
+
+
+class PipelineService:
+    # Serves the request pipeline over HTTP. Identical concurrent requests share one LLM answer
+    # through the LLM cache and one upstream request through the coalesced transport.
+    #   POST /query  {"request": "...", "format": "json" | "csv", "root": "..."}
+    #                root picks the frame to export when a CSV answer has several
+    #   GET  /stats  cache and coalescing counters
+    #   GET  /metrics  stage latency histograms and endpoint limiter state in the Prometheus text format
+    #   GET  /health
+
+    def __init__(self, chatbot, urls=None, transport=post_query, llm_cache=None, response_cache=None, one_shot=True):
+        self.transport = coalesce(transport)
+        self.llm_cache = llm_cache if llm_cache is not None else LLMCache()
+        kwargs = {'urls': urls} if urls is not None else {}
+        self.pipeline = Pipeline(chatbot, self.transport, llm_cache=self.llm_cache,
+                                 response_cache=response_cache, one_shot=one_shot, **kwargs)
+        self.served = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    def answer(self, payload):
+        if not isinstance(payload, dict):
+            return 400, {'error': 'body must be a JSON object'}
+        request = (payload.get('request') or '').strip()
+        if not request:
+            return 400, {'error': "'request' is required"}
+        csv = payload.get('format') == 'csv'
+        result = self.pipeline.run(request, frames=csv)
+        with self._lock:
+            self.served += 1
+        if not result.ok:
+            return 422, {'protocol': result.protocol, 'query': result.query, 'error': result.error}
+        if csv:
+            if not result.frames:
+                return 422, {'protocol': result.protocol, 'query': result.query, 'error': 'the response has no rows to export'}
+            root = payload.get('root')
+            if root is None and len(result.frames) > 1:
+                return 422, {'protocol': result.protocol, 'query': result.query,
+                             'error': "the response has several roots, pick one with 'root': %s" % ', '.join(result.frames)}
+            if root is not None and root not in result.frames:
+                return 422, {'protocol': result.protocol, 'query': result.query,
+                             'error': "unknown root '%s', expected one of: %s" % (root, ', '.join(result.frames))}
+            df = result.frames[root] if root is not None else next(iter(result.frames.values()))
+            return 200, (b''.join(iter_csv(df)), 'text/csv')
+        timings = {stage: round(seconds * 1000, 1) for stage, seconds in result.timings.items()}
+        return 200, {'protocol': result.protocol, 'query': result.query, 'data': result.response['data'], 'timings_ms': timings}
+
+    def stats(self):
+        return {
+            'served': self.served,
+            'llm': self.llm_cache.stats(),
+            'post_query': self.transport.flights.stats(),
+            'endpoints': LIMITERS.metrics(),
+        }
+
+    def start(self, host=HOST, port=PORT):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, content_type='application/json'):
+                content = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                if self.path == '/health':
+                    self.reply(200, {'status': 'ok'})
+                elif self.path == '/stats':
+                    self.reply(200, service.stats())
+                elif self.path == '/metrics':
+                    text = service.pipeline.tracer.prometheus() + LIMITERS.prometheus()
+                    self.reply(200, text.encode('utf-8'), 'text/plain; version=0.0.4')
+                else:
+                    self.reply(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if self.path != '/query':
+                    return self.reply(404, {'error': 'not found'})
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                except ValueError:
+                    return self.reply(400, {'error': 'body must be JSON'})
+                try:
+                    status, body = service.answer(payload)
+                except Exception as e:
+                    status, body = 500, {'error': '%s: %s' % (type(e).__name__, e)}
+                if isinstance(body, tuple):
+                    self.reply(status, *body)
+                else:
+                    self.reply(status, body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start(port=0)
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serves the natural language to GraphQL pipeline over HTTP.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--api-key', help='OpenAI key, OPENAI_API_KEY by default')
+    parser.add_argument('--mock', type=float, metavar='LATENCY', help='use the offline mock LLM with this latency in seconds')
+    parser.add_argument('--stand-in', action='store_true', help='answer from local stand-in subgraphs loaded with the recorded rows')
+    parser.add_argument('--no-one-shot', dest='one_shot', action='store_false')
+    args = parser.parse_args(argv)
+
+    urls = None
+    if args.stand_in:
+        from benchmarks.pipeline import stand_ins
+        servers = stand_ins(1000, 0.0)
+        urls = {protocol: server.start().url for protocol, server in servers.items()}
+    service = PipelineService(chatbot_factory(args.api_key, args.mock), urls, response_cache=ResponseCache(),
+                              one_shot=args.one_shot).start(args.host, args.port)
+    print('Serving on %s' % service.url, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import batch
+from utils.cache import LLMCache
+from utils.mock_llm import MockChatbot
+from utils.pipeline import Pipeline
+
+REQUESTS = ['show me the latest 5 swaps on uniswap', 'show me the latest 3 swaps on uniswap']
+
+
+def pipeline():
+    return Pipeline(lambda: MockChatbot(0.0), lambda url, query, cache=None: {'data': {'swaps': []}},
+                    urls={'uniswap': 'http://uniswap.test/'}, llm_cache=LLMCache(), scale=False)
+
+def test_empty_input_writes_an_empty_summary(tmp_path):
+    summary = batch.run_batch([], pipeline(), str(tmp_path))
+    assert list(summary.columns) == batch.SUMMARY_COLUMNS and summary.empty
+    assert (tmp_path / 'summary.csv').exists()
+
+def test_export_failures_are_recorded(tmp_path, monkeypatch):
+    monkeypatch.setitem(batch.WRITERS, 'CSV', lambda df, f: 1 / 0)
+    summary = batch.run_batch(REQUESTS, pipeline(), str(tmp_path))
+    assert list(summary['status']) == ['error', 'error']
+    assert summary['error'].str.startswith('ZeroDivisionError').all()
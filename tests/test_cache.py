@@ -0,0 +1,53 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.cache import LLMCache, ResponseCache
+
+URL = 'http://subgraph.test/'
+
+
+def test_get_returns_a_copy():
+    cache = ResponseCache()
+    cache.set(URL, '{ pairs { id } }', {'data': {'pairs': [{'id': '1'}]}})
+    cache.get(URL, '{ pairs { id } }')['data']['pairs'][0].pop('id')
+    assert cache.get(URL, '{pairs{id}}') == {'data': {'pairs': [{'id': '1'}]}}
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).set(URL, '{ pairs { id } }', {'data': {'pairs': []}})
+    assert ResponseCache(disk_dir=str(tmp_path)).get(URL, '{ pairs { id } }') == {'data': {'pairs': []}}
+
+def test_disk_tier_sweeps_least_recently_used(tmp_path):
+    value = {'data': {'pairs': [{'id': 'x' * 100}]}}
+    queries = ['{ pairs(first: %d) { id } }' % index for index in range(4)]
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    for index, query in enumerate(queries[:3]):
+        cache.set(URL, query, value)
+        os.utime(cache._path(cache.key(URL, query)), (index, index))
+    cache.max_disk_bytes = cache.disk_bytes + 10
+    cache.clear()
+    assert cache.get(URL, queries[0]) == value
+    cache.set(URL, queries[3], value)
+    assert cache.disk_bytes <= cache.max_disk_bytes
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(cache._path(cache.key(URL, queries[i]))) for i in (0, 2, 3))
+
+def test_llm_waiters_on_an_identical_prompt_count_as_hits():
+    cache = LLMCache()
+    release = threading.Event()
+    calls = []
+
+    def ask():
+        calls.append(1)
+        release.wait(5)
+        return 'answer'
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(cache.get_or_ask, 'prompt', ask) for _ in range(4)]
+        while cache.flights.stats()['shared'] < 3:
+            time.sleep(0.01)
+        release.set()
+        assert [future.result() for future in futures] == ['answer'] * 4
+    assert cache.get_or_ask('prompt', ask) == 'answer'
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert (stats['misses'], stats['hits'], stats['coalesced']) == (1, 4, 3)
@@ -0,0 +1,29 @@
+import pandas as pd
+from utils.decimals import lookup_decimals, prefetch_decimals, scale_amounts
+from utils.stand_in import StandInSubgraph
+
+TOKENS = [{'id': '0x%02x' % i, 'decimals': '18' if i % 2 else '6'} for i in range(5)]
+RESERVES = [{'id': 'r%d' % i, 'decimals': '8'} for i in range(3)]
+
+
+def test_every_token_type_is_looked_up_in_one_request():
+    with StandInSubgraph({'tokens': TOKENS, 'reserves': RESERVES}) as server:
+        prefetch_decimals(server.url, {'Token': ['0x00', '0x01', '0x09'], 'Reserve': ['r0', 'r2']})
+        assert server.requests == 1
+        assert lookup_decimals(server.url, 'Token', ['0x00', '0x01', '0x09']) == {'0x00': 6, '0x01': 18, '0x09': None}
+        assert lookup_decimals(server.url, 'Reserve', ['r0', 'r2']) == {'r0': 8, 'r2': 8}
+        assert server.requests == 1
+
+def test_scaling_asks_for_missing_decimals_once():
+    frame = pd.DataFrame({'amount': ['1000000', '5'], 'token_id': ['0x00', '0x01']})
+    with StandInSubgraph(handler=lambda query: (200, {'errors': [{'message': 'unavailable'}]})) as server:
+        scale_amounts(frame, [('amount', 'token', 'Token')] * 2, server.url)
+        assert server.requests == 0
+        prefetch_decimals(server.url, {'Token': ['0x00', '0x01']})
+        scale_amounts(frame, [('amount', 'token', 'Token')] * 2, server.url)
+        assert server.requests == 1
+    assert frame['amount_scaled'].isna().all()
+
+def test_null_decimals_stay_unscaled():
+    with StandInSubgraph({'tokens': [{'id': '0x00', 'decimals': None}, {'id': '0x01', 'decimals': '2'}]}) as server:
+        assert lookup_decimals(server.url, 'Token', ['0x00', '0x01']) == {'0x00': None, '0x01': 2}
@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from utils.dtypes import big_integers
+
+
+def test_big_integers_fit_int64():
+    assert big_integers(pd.Series(['1', '-2'])).dtype == np.int64
+    assert str(big_integers(pd.Series(['1', None])).dtype) == 'Int64'
+
+def test_overflowing_big_integers_stay_exact_and_arrow_friendly():
+    wide = '1' + '0' * 30
+    column = big_integers(pd.Series([wide, '5', None]))
+    assert column.tolist() == [wide, '5', None]
+    assert pa.Table.from_pandas(column.to_frame('amount')).column('amount').type == pa.string()
@@ -0,0 +1,25 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from utils.executor import iter_queries, limit_endpoints
+from utils.stand_in import StandInSubgraph
+from utils.the_graph import post_query
+
+
+def collect(pairs, **kwargs):
+    async def run():
+        return [item async for item in iter_queries(pairs, **kwargs)]
+    return asyncio.run(run())
+
+def test_results_come_back_indexed_and_capped_per_endpoint():
+    with StandInSubgraph({'pairs': [{'id': '1'}]}, latency=0.05) as server:
+        results = collect([(server.url, '{ pairs(first: %d) { id } }' % (i + 1)) for i in range(8)], per_endpoint=2)
+        assert server.max_in_flight == 2
+    assert sorted(index for index, _ in results) == list(range(8))
+    assert all(result == {'data': {'pairs': [{'id': '1'}]}} for _, result in results)
+
+def test_limit_endpoints_caps_threaded_requests_per_endpoint():
+    send = limit_endpoints(post_query, 2)
+    with StandInSubgraph({'swaps': [{'id': '1'}]}, latency=0.05) as server:
+        with ThreadPoolExecutor(6) as pool:
+            list(pool.map(lambda i: send(server.url, '{ swaps(first: %d) { id } }' % (i + 1)), range(6)))
+        assert server.max_in_flight == 2
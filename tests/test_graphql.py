@@ -0,0 +1,16 @@
+import pytest
+from utils.graphql import GraphQLSyntaxError, parse, render
+from utils.the_graph import pin_query
+
+
+def test_strings_survive_a_round_trip():
+    query = r'{ nfts(where: {name_contains: "café 🚀", description: "line\nbreak \"quoted\" \\ é"}) { id } }'
+    where = parse(query).fields[0].arguments['where']
+    assert where == {'name_contains': 'café 🚀', 'description': 'line\nbreak "quoted" \\ é'}
+    rendered = render(parse(query))
+    assert parse(rendered).fields[0].arguments['where'] == where
+    assert parse(pin_query(query, 5)).fields[0].arguments['where'] == where
+
+def test_invalid_escapes_are_syntax_errors():
+    with pytest.raises(GraphQLSyntaxError):
+        parse(r'{ nfts(where: {name: "\q"}) { id } }')
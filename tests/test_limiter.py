@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+from utils.limiter import LIMITERS, AdaptiveConcurrency, TokenBucket
+from utils.stand_in import StandInSubgraph
+from utils.the_graph import post_query
+
+
+def test_limit_grows_only_while_saturated():
+    concurrency = AdaptiveConcurrency(initial=4)
+    concurrency.acquire()
+    concurrency.release(0.01, False)
+    assert concurrency.limit == 4
+    for _ in range(4):
+        concurrency.acquire()
+    concurrency.release(0.01, False)
+    assert concurrency.limit == 4.25
+
+def test_limit_halves_on_congestion_once_per_round_trip():
+    concurrency = AdaptiveConcurrency(initial=8)
+    for _ in range(3):
+        concurrency.acquire()
+    concurrency.release(0.01, True)
+    concurrency.release(0.01, True)
+    assert concurrency.limit == 4 and concurrency.decreases == 1
+    concurrency.release(1.0, False)
+    assert concurrency.limit == 4
+
+def test_pause_empties_the_bucket():
+    bucket = TokenBucket(rate=100, burst=10)
+    bucket.pause(0.2)
+    assert not bucket.try_acquire()
+    assert bucket.acquire() >= 0.15
+
+def test_throttled_endpoint_backs_off_and_recovers():
+    server = StandInSubgraph({'swaps': [{'id': '1'}]}, latency=0.05, max_concurrency=2, retry_after=0.1)
+    with server:
+        LIMITERS.configure(server.url, initial=8)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda i: post_query(server.url, '{ swaps(first: %d) { id } }' % (i + 1)), range(16)))
+        metrics = LIMITERS.metrics()[server.url]
+    assert server.throttled > 0
+    assert metrics['decreases'] >= 1 and metrics['concurrency_limit'] < 8
+    assert all('data' in result for result in results)
@@ -0,0 +1,36 @@
+import pytest
+from utils.llm import QueryExtractor, extract_query, parse_one_shot, read_query
+
+QUERY = '{ nfts(where: {name_contains: "{ not a brace }", description: "say \\"}\\" twice"}) { id } }'
+
+
+def test_extractor_stops_on_balanced_braces_outside_strings():
+    extractor = QueryExtractor()
+    answer = 'Here is the query:\n' + QUERY + '\nIt returns { the ids }.'
+    done = [extractor.feed(answer[i:i + 3]) for i in range(0, len(answer), 3)]
+    assert extractor.query == QUERY
+    assert done.index(True) == (len('Here is the query:\n') + len(QUERY) - 1) // 3
+
+def test_extract_query_without_a_closing_brace_keeps_what_it_has():
+    assert extract_query('text { swaps { id }') == '{ swaps { id }'
+
+def test_read_query_stops_reading_the_stream():
+    read = []
+
+    def stream():
+        for chunk in ('{ swaps', ' { id } }', ' and more', ' chatter'):
+            read.append(chunk)
+            yield chunk
+
+    assert read_query(stream()) == '{ swaps { id } }'
+    assert read == ['{ swaps', ' { id } }']
+
+@pytest.mark.parametrize('answer, expected', [
+    ('protocol: uniswap\n{ swaps { id } }', ('uniswap', '{ swaps { id } }')),
+    ('Protocol - Aave\n```graphql\n{ supplies { id } }\n```', ('aave', '{ supplies { id } }')),
+    ('{ swaps { id } }', (None, None)),
+    ('protocol: sushiswap\n{ swaps { id } }', (None, None)),
+    ('protocol: uniswap\nI cannot write that query.', (None, None)),
+])
+def test_one_shot_answers(answer, expected):
+    assert parse_one_shot(answer) == expected
@@ -0,0 +1,54 @@
+import pytest
+from utils.cache import ResponseCache
+from utils.stand_in import StandInSubgraph
+from utils.the_graph import QueryError, paginate_query
+
+SWAPS = [{'id': 's%02d' % i, 'timestamp': 100 if 2 <= i < 9 else i * 10} for i in range(12)]
+
+
+def read_ids(url, query, **kwargs):
+    return [row['id'] for page in paginate_query(url, query, **kwargs) for row in page]
+
+def test_pages_by_id():
+    rows = [{'id': 'p%02d' % i} for i in range(10)]
+    with StandInSubgraph({'pairs': rows}) as server:
+        assert read_ids(server.url, '{ pairs { id } }', page_size=3) == [row['id'] for row in rows]
+        assert read_ids(server.url, '{ pairs(first: 4) { id } }', page_size=3) == ['p00', 'p01', 'p02', 'p03']
+
+@pytest.mark.parametrize('direction', ['asc', 'desc'])
+def test_reads_every_row_when_a_timestamp_spans_several_pages(direction):
+    query = '{ swaps(orderBy: timestamp, orderDirection: %s) { id timestamp } }' % direction
+    expected = sorted(SWAPS, key=lambda row: row['timestamp'], reverse=direction == 'desc')
+    with StandInSubgraph({'swaps': SWAPS}) as server:
+        ids = read_ids(server.url, query, page_size=3)
+    assert sorted(ids) == sorted(row['id'] for row in SWAPS)
+    timestamps = {row['id']: row['timestamp'] for row in SWAPS}
+    assert [timestamps[i] for i in ids] == [row['timestamp'] for row in expected]
+
+def test_injected_cursor_fields_are_dropped():
+    with StandInSubgraph({'swaps': SWAPS}) as server:
+        pages = list(paginate_query(server.url, '{ swaps(orderBy: timestamp) { timestamp } }', page_size=5))
+    assert all(list(row) == ['timestamp'] for page in pages for row in page)
+
+def test_null_data_raises_query_error():
+    server = StandInSubgraph(handler=lambda query: (200, {'data': None, 'errors': [{'message': 'indexing error'}]}))
+    with server, pytest.raises(QueryError):
+        list(paginate_query(server.url, '{ swaps { id } }'))
+
+def test_snapshot_reads_every_page_at_one_block():
+    rows = [{'id': '%04d' % i, 'timestamp': i} for i in range(30)]
+    with StandInSubgraph({'swaps': rows}, block=10) as server:
+        ids = []
+        for page in paginate_query(server.url, '{ swaps { id } }', page_size=10, snapshot=True):
+            ids += [row['id'] for row in page]
+            server.advance({'swaps': [{'id': '0000-%d' % len(ids), 'timestamp': -1}]})
+    assert ids == ['%04d' % i for i in range(30)]
+
+def test_cached_pages_can_be_read_again():
+    cache = ResponseCache()
+    query = '{ swaps(orderBy: timestamp) { timestamp } }'
+    with StandInSubgraph({'swaps': SWAPS}) as server:
+        first = list(paginate_query(server.url, query, page_size=5, block=1, cache=cache))
+        requests = server.requests
+        assert list(paginate_query(server.url, query, page_size=5, block=1, cache=cache)) == first
+        assert server.requests == requests
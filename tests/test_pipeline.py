@@ -0,0 +1,39 @@
+from utils.cache import LLMCache
+from utils.mock_llm import MockChatbot
+from utils.pipeline import Pipeline, PipelineResult
+
+REQUEST = 'show me the latest 5 swaps on uniswap'
+
+
+def pipeline(transport):
+    return Pipeline(lambda: MockChatbot(0.0), transport, urls={'uniswap': 'http://uniswap.test/'}, llm_cache=LLMCache())
+
+def test_errors_with_null_data_fail_the_result():
+    failed = {'data': None, 'errors': [{'message': 'indexing error'}]}
+    result = pipeline(lambda url, query, cache=None: failed).run(REQUEST)
+    assert not result.ok and 'indexing error' in result.error
+    assert result.frames == {}
+
+def test_rows_become_frames():
+    rows = [{'id': '1', 'timestamp': '1700000000'}]
+    result = pipeline(lambda url, query, cache=None: {'data': {'swaps': rows}}).run(REQUEST)
+    assert result.ok, result.error
+    assert list(result.frames) == ['swaps'] and len(result.frames['swaps']) == 1
+
+def test_decimals_are_looked_up_through_the_transport():
+    seen = []
+
+    def transport(url, query, cache=None):
+        seen.append((url, query, cache))
+        if 'decimals' in query:
+            return {'data': {'q0_tokens': [{'id': '0xaa', 'decimals': '6'}]}}
+        return {'data': {'swaps': [{'id': '1', 'amountIn': '2500000', 'tokenIn': {'id': '0xaa'}}]}}
+
+    url = 'http://decimals.test/'
+    cache = object()
+    result = PipelineResult(REQUEST, 'uniswap', '{ swaps(first: 1) { id amountIn tokenIn { id } } }')
+    piped = Pipeline(lambda: MockChatbot(0.0), transport, urls={'uniswap': url}, llm_cache=LLMCache(), response_cache=cache)
+    piped.build_frames(piped.fetch(result))
+    assert result.ok, result.error
+    assert len(seen) == 2 and all(u == url and c is cache for u, _, c in seen)
+    assert result.frames['swaps']['amountIn_scaled'].tolist() == [2.5]
@@ -0,0 +1,34 @@
+from utils.refresh import IncrementalRefresher
+from utils.stand_in import StandInSubgraph
+from utils.the_graph import post_query
+
+LATEST = '{ sales(first: 5, orderBy: timestamp, orderDirection: desc) { price } }'
+
+
+def sales(start, stop):
+    return [{'id': 's%04d' % i, 'price': str(i), 'timestamp': str(1000 + i)} for i in range(start, stop)]
+
+def test_latest_rows_are_refreshed_from_the_watermark():
+    rows = sales(0, 40)
+    with StandInSubgraph({'sales': rows}) as server:
+        refresher = IncrementalRefresher()
+        first = refresher.refresh(server.url, LATEST, 'decentraland')
+        assert [row['price'] for row in first['data']['sales']] == ['39', '38', '37', '36', '35']
+        rows.extend(sales(40, 43))
+        second = refresher.refresh(server.url, LATEST, 'decentraland')
+        assert [row['price'] for row in second['data']['sales']] == ['42', '41', '40', '39', '38']
+        assert server.requests == 2
+
+def test_other_queries_are_passed_through_untouched():
+    with StandInSubgraph({'sales': sales(0, 40)}) as server:
+        refresher = IncrementalRefresher()
+        for query in ('{ sales(first: 5, orderBy: timestamp) { price } }', '{ sales(where: {price_gt: "35"}) { id price } }'):
+            assert refresher.refresh(server.url, query, 'decentraland') == post_query(server.url, query)
+        assert not refresher.states
+
+def test_states_are_capped():
+    with StandInSubgraph({'sales': sales(0, 40)}) as server:
+        refresher = IncrementalRefresher(max_states=2)
+        for first in (1, 2, 3):
+            refresher.refresh(server.url, LATEST.replace('first: 5', 'first: %d' % first), 'decentraland')
+        assert len(refresher.states) == 2
@@ -0,0 +1,21 @@
+import os
+from utils import schema_model
+from utils.schema_model import load_schema, schema_from_dict, schema_to_dict
+
+
+def test_cached_model_matches_the_parsed_one(tmp_path, monkeypatch):
+    parsed = load_schema('aave', cache_dir=None)
+    monkeypatch.setattr(schema_model, '_loaded', {})
+    written = load_schema('aave', cache_dir=str(tmp_path))
+    monkeypatch.setattr(schema_model, '_loaded', {})
+    read = load_schema('aave', cache_dir=str(tmp_path))
+    assert schema_to_dict(read) == schema_to_dict(written) == schema_to_dict(parsed)
+    assert schema_to_dict(schema_from_dict(schema_to_dict(parsed))) == schema_to_dict(parsed)
+
+def test_unreadable_cache_files_are_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema_model, '_loaded', {})
+    load_schema('uniswap', cache_dir=str(tmp_path))
+    [name] = os.listdir(tmp_path)
+    (tmp_path / name).write_text('{"Swap": {"kind": "type"}}')
+    monkeypatch.setattr(schema_model, '_loaded', {})
+    assert 'Swap' in load_schema('uniswap', cache_dir=str(tmp_path)).types
@@ -0,0 +1,6 @@
+from utils.schema_slice import rank_entities
+
+
+def test_protocol_name_does_not_rank_its_top_level_entity():
+    ranked, _ = rank_entities('balancer', 'the latest 50 balancer swaps')
+    assert ranked[0] == 'Swap' and 'Balancer' not in ranked
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from service import PipelineService
+from utils.cache import LLMCache, SingleFlight, coalesce
+from utils.mock_llm import MockChatbot
+from utils.stand_in import StandInSubgraph
+from utils.the_graph import post_query
+
+REQUEST = 'show me the latest 5 swaps on uniswap'
+
+
+def service(response):
+    return PipelineService(lambda: MockChatbot(0.0), {'uniswap': 'http://uniswap.test/'},
+                           transport=lambda url, query, cache=None: response, llm_cache=LLMCache())
+
+def test_single_flight_runs_concurrent_calls_once():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {'rows': 1}
+
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flights.do, 'key', work) for _ in range(5)]
+        while flights.stats()['shared'] < 4:
+            time.sleep(0.01)
+        release.set()
+        assert [future.result() for future in futures] == [{'rows': 1}] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {'executions': 1, 'shared': 4, 'in_flight': 0}
+
+def test_single_flight_forgets_failed_calls():
+    flights = SingleFlight()
+    try:
+        flights.do('key', lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    assert flights.do('key', lambda: 2) == 2
+
+def test_identical_requests_share_one_upstream_call():
+    with StandInSubgraph({'swaps': [{'id': '1'}]}, latency=0.2) as server:
+        send = coalesce(post_query)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: send(server.url, '{ swaps { id } }'), range(8)))
+        assert server.requests == 1
+    assert results == [{'data': {'swaps': [{'id': '1'}]}}] * 8
+
+def test_csv_of_rows():
+    status, (body, content_type) = service({'data': {'swaps': [{'id': '1'}, {'id': '2'}]}}).answer(
+        {'request': REQUEST, 'format': 'csv'})
+    assert status == 200 and content_type == 'text/csv'
+    assert body.decode('utf-8').splitlines() == ['id', '1', '2']
+
+def test_csv_without_frames_is_rejected():
+    status, body = service({'data': {}}).answer({'request': REQUEST, 'format': 'csv'})
+    assert status == 422 and 'no rows' in body['error']
+
+def test_json_answer_skips_frames():
+    status, body = service({'data': {'swaps': [{'id': '1'}]}}).answer({'request': REQUEST})
+    assert status == 200 and body['data'] == {'swaps': [{'id': '1'}]}
+    assert 'frames' not in body['timings_ms']
+
+def test_csv_of_several_roots_needs_a_root():
+    answer = service({'data': {'swaps': [{'id': '1'}], 'mints': [{'id': '2'}]}}).answer
+    status, body = answer({'request': REQUEST, 'format': 'csv'})
+    assert status == 422 and 'swaps, mints' in body['error']
+    status, (body, _) = answer({'request': REQUEST, 'format': 'csv', 'root': 'mints'})
+    assert status == 200 and body.decode('utf-8').splitlines() == ['id', '2']
+    status, body = answer({'request': REQUEST, 'format': 'csv', 'root': 'burns'})
+    assert status == 422 and 'burns' in body['error']
+
+def test_body_must_be_an_object():
+    status, body = service({'data': {}}).answer([1])
+    assert status == 400 and 'object' in body['error']
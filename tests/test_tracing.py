@@ -0,0 +1,26 @@
+import json
+from utils.tracing import Tracer
+from utils.urls import URLS
+
+
+def test_metric_labels_are_bounded_and_spans_keep_raw_values(tmp_path):
+    tracer = Tracer(jsonl_path=str(tmp_path / 'spans.jsonl'))
+    with tracer.trace('request') as trace:
+        with tracer.span('fetch', protocol='uniswap', entity='swaps'):
+            pass
+        with tracer.span('fetch', protocol='Protocol: uniswap!', entity='swaps'):
+            pass
+        with tracer.span('http', endpoint=URLS['aave'], status=429):
+            pass
+        with tracer.span('http', endpoint='http://127.0.0.1:1234/', status=200):
+            pass
+    assert sorted(tracer.histograms) == [
+        ('fetch', (('entity', 'other'), ('protocol', 'other'))),
+        ('fetch', (('entity', 'swaps'), ('protocol', 'uniswap'))),
+        ('http', (('endpoint', 'aave'), ('status', '4xx'))),
+        ('http', (('endpoint', 'other'), ('status', '2xx'))),
+    ]
+    assert trace.spans[1].labels['protocol'] == 'Protocol: uniswap!'
+    lines = [json.loads(line) for line in (tmp_path / 'spans.jsonl').read_text().splitlines()]
+    assert [line['labels'].get('endpoint') for line in lines[2:]] == [URLS['aave'], 'http://127.0.0.1:1234/']
+    assert 'endpoint="other"' in tracer.prometheus()
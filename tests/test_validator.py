@@ -0,0 +1,26 @@
+import pytest
+from utils.validator import repair_query, validate_query
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('{ swapz(first: 5) { id } }', '{ swaps(first: 5) { id } }'),
+    ('{ swapp(id: "0x1") { id } }', '{ swap(id: "0x1") { id } }'),
+    ('{ swaps(first: 5) { id timestmp } }', '{ swaps(first: 5) { id timestamp } }'),
+    ('{ swaps(first: 5, orderBy: timestmp, orderDirection: descending) { id } }',
+     '{ swaps(first: 5, orderBy: timestamp, orderDirection: desc) { id } }'),
+    ('{ swaps(where: {amountInn_gt: "5"}) { id } }', '{ swaps(where: {amountIn_gt: "5"}) { id } }'),
+    ('{ swaps(first: 1) { id pool } }', '{ swaps(first: 1) { id pool { id } } }'),
+])
+def test_repairs_to_the_nearest_schema_name(query, expected):
+    repaired, issues = repair_query('uniswap', query)
+    assert issues == []
+    assert ' '.join(repaired.split()) == expected
+
+def test_valid_queries_are_left_alone():
+    query = '{ swaps(first: 5, orderBy: timestamp, orderDirection: desc) { id amountIn } }'
+    assert validate_query('uniswap', query) == []
+    assert repair_query('uniswap', query) == (query, [])
+
+def test_unfixable_issues_are_reported():
+    repaired, issues = repair_query('uniswap', '{ swaps(frist: 5) { id } }')
+    assert [str(issue) for issue in issues] == ["swaps(frist): unknown argument 'frist' (did you mean 'first'?)"]
@@ -0,0 +1,37 @@
+from utils.graphql import Document, Field, parse, render
+from utils.the_graph import post_query
+
+
+def merge_queries(queries):
+    # Aliases every root field as q<index>_<key> so several queries can share one request.
+    merged = Document()
+    aliases = []
+    for index, query in enumerate(queries):
+        document = parse(query)
+        if document.variables:
+            raise ValueError('Queries with variables cannot be batched')
+        names = {}
+        for field in document.fields:
+            alias = 'q%d_%s' % (index, field.key)
+            names[alias] = field.key
+            merged.selections.append(Field(field.name, alias, field.arguments, field.selections))
+        aliases.append(names)
+    return render(merged), aliases
+
+def split_response(result, aliases):
+    data = result.get('data') or {}
+    errors = result.get('errors') or []
+    results = []
+    for names in aliases:
+        part = {'data': {key: data.get(alias) for alias, key in names.items()}}
+        mine = [e for e in errors if not e.get('path') or e['path'][0] in names]
+        if mine:
+            part['errors'] = mine
+        if not data:
+            del part['data']
+        results.append(part)
+    return results
+
+def post_batch(url, queries, transport=post_query, **kwargs):
+    query, aliases = merge_queries(queries)
+    return split_response(transport(url, query, **kwargs), aliases)
@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from utils.graphql import Field, GraphQLSyntaxError, parse, render_value
+
+TTL = 300
+MAX_BYTES = 64 * 1024 * 1024
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def _sorted_value(value):
+    if isinstance(value, dict):
+        return type(value)(sorted((k, _sorted_value(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return [_sorted_value(v) for v in value]
+    return value
+
+
+def _normalize_selection(selection):
+    if isinstance(selection, Field):
+        head = selection.alias + ':' + selection.name if selection.alias else selection.name
+        if selection.arguments:
+            head += '(%s)' % ','.join(
+                '%s:%s' % (k, render_value(_sorted_value(v))) for k, v in sorted(selection.arguments.items())
+            )
+    else:
+        head = '...on ' + selection.type_condition
+    if selection.selections:
+        head += '{%s}' % ' '.join(sorted(_normalize_selection(s) for s in selection.selections))
+    return head
+
+
+def normalize_query(query):
+    # Whitespace, comments, argument order and field order do not change the result set.
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError:
+        return re.sub(r'\s+', ' ', query).strip()
+    return '{%s}' % ' '.join(sorted(_normalize_selection(s) for s in document.selections))
+
+
+def is_block_pinned(query):
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError:
+        return False
+    if not document.fields:
+        return False
+    for field in document.fields:
+        block = field.arguments.get('block')
+        if not isinstance(block, dict) or not ('number' in block or 'hash' in block):
+            return False
+    return True
+
+
+class ResponseCache:
+    # Entries are kept as encoded JSON, every get decodes a fresh copy the caller is free to mutate.
+    # The disk tier holds up to max_disk_bytes, least recently used files are swept first.
+
+    def __init__(self, ttl=TTL, max_bytes=MAX_BYTES, disk_dir=None, max_disk_bytes=MAX_DISK_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_bytes = sum(size for _, _, size in self._disk_files())
+
+    def key(self, url, query):
+        return hashlib.sha256(('%s\n%s' % (url, normalize_query(query))).encode('utf-8')).hexdigest()
+
+    def get(self, url, query):
+        key = self.key(url, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry[0] is None or entry[0] > time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[2])
+            if entry:
+                self._remove(key)
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry:
+                self._store(key, *entry)
+                self.hits += 1
+                return json.loads(entry[2])
+            self.misses += 1
+
+    def set(self, url, query, value, pinned=None):
+        if pinned is None:
+            pinned = is_block_pinned(query)
+        expires = None if pinned else time.time() + self.ttl
+        content = json.dumps(value)
+        key = self.key(url, query)
+        with self._lock:
+            self._store(key, expires, len(content), content)
+        if self.disk_dir:
+            self._write_disk(key, expires, content)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _store(self, key, expires, size, content):
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires, size, content)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[1]
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + '.json')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                header = f.readline()
+                content = f.read()
+            expires = json.loads(header)
+        except (OSError, ValueError):
+            return None
+        if not (expires is None or isinstance(expires, (int, float))) or not content:
+            return None
+        if expires is not None and expires <= time.time():
+            self._remove_disk(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return expires, len(content), content
+
+    def _write_disk(self, key, expires, content):
+        # The first line holds the expiry, the rest is the response exactly as it was encoded.
+        path = self._path(key)
+        tmp = '%s.%d.tmp' % (path, threading.get_ident())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('%s\n%s' % (json.dumps(expires), content))
+        with self._disk_lock:
+            try:
+                self.disk_bytes -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+            self.disk_bytes += os.path.getsize(path)
+            if self.disk_bytes > self.max_disk_bytes:
+                self._sweep_disk()
+
+    def _disk_files(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.json') and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def _sweep_disk(self):
+        # Oldest first, reads touch their file so this drops the least recently used entries.
+        for _, path, size in sorted(self._disk_files()):
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+
+    def _remove_disk(self, path):
+        with self._disk_lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            self.disk_bytes -= size
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key wait for the first one and share its result, which they must not mutate.
+
+    def __init__(self):
+        self.executions = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = function()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                self.executions += 1
+            flight.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {'executions': self.executions, 'shared': self.shared, 'in_flight': len(self._flights)}
+
+
+def coalesce(transport, flights=None):
+    # Wraps a post_query style transport so identical in-flight queries cost one upstream request.
+    flights = flights if flights is not None else SingleFlight()
+
+    def send(url, query, **kwargs):
+        return flights.do((url, normalize_query(query)), lambda: transport(url, query, **kwargs))
+    send.flights = flights
+    return send
+
+
+class LLMCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.flights = SingleFlight()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_ask(self, key, ask):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+        asked = []
+
+        def ask_and_store():
+            asked.append(key)
+            with self._lock:
+                self.misses += 1
+            start = time.perf_counter()
+            value = ask()
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._entries[key] = (value, elapsed)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+
+        # Identical prompts asked while the first answer is still streaming wait for it instead of asking again,
+        # those waits count as hits.
+        start = time.perf_counter()
+        value = self.flights.do(key, ask_and_store)
+        if not asked:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.hits += 1
+                entry = self._entries.get(key)
+                self.saved_seconds += max(entry[1] - waited, 0.0) if entry else 0.0
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'saved_seconds': round(self.saved_seconds, 3),
+                'coalesced': self.flights.shared,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 2000
+RESAMPLE_RULES = {'Hourly': 'h', 'Daily': 'D', 'Weekly': 'W'}
+
+
+def lttb_indices(x, y, budget):
+    # Largest-Triangle-Three-Buckets: keeps the points that carry the visible shape of the line.
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    selected = np.empty(budget, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:following_end].mean() if following_end > end else x[-1]
+        next_y = y[end:following_end].mean() if following_end > end else y[-1]
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(area)) if len(area) and not np.isnan(area).all() else start
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_indices(y, budget):
+    # Keeps the lowest and highest point of every bucket, spikes survive any zoom level.
+    n = len(y)
+    buckets = max(budget // 2, 1)
+    if n <= budget:
+        return np.arange(n)
+    groups = pd.Series(y).groupby(np.arange(n) * buckets // n)
+    keep = np.concatenate([groups.idxmin().dropna().to_numpy(), groups.idxmax().dropna().to_numpy(), [0, n - 1]])
+    return np.unique(keep.astype(int))
+
+def plot_frame(df, columns):
+    # A typed copy of just the plotted columns, the session frame is left untouched.
+    x_column, y_columns = columns[0], list(columns[1:])
+    x = df[x_column]
+    if x_column.lower() == 'timestamp' and not pd.api.types.is_datetime64_any_dtype(x):
+        x = pd.to_datetime(pd.to_numeric(x, errors='coerce'), unit='s')
+    frame = pd.DataFrame({c: pd.to_numeric(df[c], errors='coerce').astype(float) for c in y_columns})
+    frame.index = pd.Index(x, name=x_column)
+    if pd.api.types.is_datetime64_any_dtype(frame.index) or pd.api.types.is_numeric_dtype(frame.index):
+        frame = frame[frame.index.notna()].sort_index()
+    return frame
+
+def downsample(frame, max_points=MAX_POINTS, method='lttb'):
+    if len(frame) <= max_points or not len(frame.columns):
+        return frame
+    index = frame.index
+    if pd.api.types.is_datetime64_any_dtype(index):
+        x = index.asi8.astype(float)
+    elif pd.api.types.is_numeric_dtype(index):
+        x = index.to_numpy(dtype=float)
+    else:
+        x = np.arange(len(frame), dtype=float)
+    budget = max(max_points // len(frame.columns), 3)
+    keep = []
+    for column in frame.columns:
+        y = frame[column].to_numpy(dtype=float)
+        y = np.where(np.isnan(y), np.nanmean(y) if not np.isnan(y).all() else 0.0, y)
+        keep.append(lttb_indices(x, y, budget) if method == 'lttb' else minmax_indices(y, budget))
+    return frame.iloc[np.unique(np.concatenate(keep))]
+
+def chart_frame(df, columns, resample=None, max_points=MAX_POINTS, method='lttb'):
+    frame = plot_frame(df, columns)
+    if resample and pd.api.types.is_datetime64_any_dtype(frame.index):
+        frame = frame.resample(RESAMPLE_RULES.get(resample, resample)).mean().dropna(how='all')
+    return downsample(frame, max_points, method)
@@ -0,0 +1,13 @@
+import os
+
+
+def chatbot_factory(api_key=None, mock_latency=None):
+    # Zero-argument factory for Pipeline, the offline mock when mock_latency is given.
+    if mock_latency is not None:
+        from utils.mock_llm import MockChatbot
+        return lambda: MockChatbot(mock_latency)
+    from revChatGPT.V3 import Chatbot
+    api_key = api_key or os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        raise SystemExit('An API key is needed, pass --api-key or set OPENAI_API_KEY (or use --mock)')
+    return lambda: Chatbot(api_key=api_key)
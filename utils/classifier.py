@@ -0,0 +1,68 @@
+import re
+from collections import defaultdict
+from utils.schemas import SCHEMAS
+from utils.schema_model import load_schema
+from utils.urls import URLS
+
+THRESHOLD = 0.6
+MIN_SCORE = 3.0
+PROTOCOL_WEIGHT = 10.0
+ENTITY_WEIGHT = 3.0
+FIELD_WEIGHT = 1.0
+STOPWORDS = {'a', 'an', 'and', 'at', 'by', 'data', 'for', 'from', 'id', 'in', 'is', 'me', 'of', 'on', 'or', 'the', 'to', 'type'}
+
+_vocabulary = None
+
+
+def stem(word):
+    word = word.lower()
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('ses', 'xes', 'ches', 'shes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+def terms(text):
+    whole = re.findall(r'[a-z0-9]+', text.lower())
+    words = re.findall(r'[a-z0-9]+', re.sub(r'([a-z])([A-Z])', r'\1 \2', text).lower())
+    words = [w for w in words if w not in STOPWORDS]
+    # Adjacent pairs so "flash loans" matches the FlashLoan entity.
+    return {stem(w) for w in whole + words} | {stem(a + b) for a, b in zip(words, words[1:])}
+
+def build_vocabulary():
+    weights = defaultdict(dict)
+
+    def add(term, protocol, weight):
+        weights[term][protocol] = max(weight, weights[term].get(protocol, 0.0))
+
+    for protocol in URLS:
+        add(stem(protocol), protocol, PROTOCOL_WEIGHT)
+    for protocol in SCHEMAS:
+        for type_name, schema_type in load_schema(protocol).types.items():
+            if schema_type.kind in ('type', 'enum'):
+                add(stem(type_name), protocol, ENTITY_WEIGHT)
+            for field_name in schema_type.fields:
+                if field_name.lower() not in STOPWORDS:
+                    add(stem(field_name), protocol, FIELD_WEIGHT)
+    # Terms shared by several protocols say little about which one is meant.
+    return {
+        term: {protocol: weight / len(protocols) for protocol, weight in protocols.items()}
+        for term, protocols in weights.items()
+    }
+
+def classify_protocol(text):
+    global _vocabulary
+    if _vocabulary is None:
+        _vocabulary = build_vocabulary()
+    scores = defaultdict(float)
+    for term in terms(text):
+        for protocol, weight in _vocabulary.get(term, {}).items():
+            scores[protocol] += weight
+    if not scores:
+        return None, 0.0
+    protocol = max(scores, key=scores.get)
+    if scores[protocol] < MIN_SCORE:
+        return protocol, 0.0
+    return protocol, scores[protocol] / sum(scores.values())
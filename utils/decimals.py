@@ -0,0 +1,124 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+from utils.frames import SEPARATOR
+from utils.graphql import GraphQLSyntaxError, parse
+from utils.schema_model import load_schema
+from utils.batching import post_batch
+from utils.the_graph import post_query
+from utils.validator import lower_first, plural, root_fields
+
+AMOUNT_RE = re.compile(r'^amount(?P<suffix>[A-Z]\w*)?$|Fee$')
+# Token-like types the subgraphs expose with a decimals field, even where the embedded SDL omits them.
+TOKEN_TYPES = ('Token', 'Reserve')
+SCALED_SUFFIX = '_scaled'
+LOOKUP_SIZE = 1000
+
+_decimals = {}
+_lock = threading.Lock()
+
+
+def token_fields(schema, entity):
+    fields = {}
+    for field in schema.types[entity].fields.values():
+        target = schema.types.get(field.type_name)
+        if field.is_list:
+            continue
+        if field.type_name in TOKEN_TYPES or (target is not None and 'decimals' in target.fields):
+            fields[field.name] = field.type_name
+    return fields
+
+def amount_pairs(protocol, query):
+    # {root key: [(amount field, token field, token type)]} for BigInt amounts selected at the root level.
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError:
+        return {}
+    schema = load_schema(protocol)
+    roots = root_fields(schema)
+    pairs = {}
+    for root in document.fields:
+        entity = roots.get(root.name, (None,))[0]
+        if entity is None or entity not in schema.types:
+            continue
+        tokens = token_fields(schema, entity)
+        found = []
+        for selection in root.selections:
+            definition = schema.field(entity, getattr(selection, 'name', None))
+            match = AMOUNT_RE.search(selection.name) if definition else None
+            if not match or definition.type_name != 'BigInt':
+                continue
+            token = 'token' + match.group('suffix') if match.group('suffix') else None
+            if token not in tokens:
+                token = next(iter(tokens)) if len(tokens) == 1 else None
+            if token:
+                found.append((selection.key, token, tokens[token]))
+        if found:
+            pairs[root.key] = found
+    return pairs
+
+def prefetch_decimals(url, lookups, transport=post_query, response_cache=None):
+    # {token type: ids}, every missing id of every type is looked up in one aliased request.
+    # Token decimals never change, so each id is fetched once per endpoint and kept for the process.
+    queries = []
+    for token_type, ids in lookups.items():
+        cache = _decimals.setdefault((url, token_type), {})
+        with _lock:
+            missing = sorted({i for i in ids if i not in cache and isinstance(i, str)})
+        root = plural(lower_first(token_type))
+        for start in range(0, len(missing), LOOKUP_SIZE):
+            chunk = missing[start:start + LOOKUP_SIZE]
+            query = '{ %s(first: %d, where: {id_in: [%s]}) { id decimals } }' % (
+                root, len(chunk), ', '.join('"%s"' % i for i in chunk))
+            queries.append((cache, root, chunk, query))
+    if not queries:
+        return
+    results = post_batch(url, [query for _, _, _, query in queries], transport, cache=response_cache)
+    with _lock:
+        for (cache, root, chunk, _), result in zip(queries, results):
+            rows = (result.get('data') or {}).get(root)
+            if rows is None:
+                continue
+            found = {row['id']: int(row['decimals']) for row in rows if row.get('decimals') is not None}
+            # Ids the subgraph does not know, or knows without decimals, stay unscaled instead of being asked for again.
+            for i in chunk:
+                cache[i] = found.get(i)
+
+def lookup_decimals(url, token_type, ids):
+    prefetch_decimals(url, {token_type: ids})
+    return _decimals[(url, token_type)]
+
+def scale_amounts(df, pairs, url=None):
+    # Only reads decimals already looked up for url, scale_frames prefetches them in one request.
+    for amount, token, token_type in pairs:
+        if amount not in df.columns:
+            continue
+        decimals_column = token + SEPARATOR + 'decimals'
+        if decimals_column in df.columns:
+            decimals = pd.to_numeric(df[decimals_column], errors='coerce')
+        elif url and token + SEPARATOR + 'id' in df.columns:
+            ids = df[token + SEPARATOR + 'id']
+            with _lock:
+                known = dict(_decimals.get((url, token_type), {}))
+            decimals = ids.map(known).astype(float)
+        else:
+            continue
+        # Floats hold wei-scale values without overflowing, the division runs over the whole column.
+        amounts = pd.to_numeric(df[amount].astype(object), errors='coerce').astype(float)
+        df[amount + SCALED_SUFFIX] = amounts.to_numpy() / np.power(10.0, decimals.to_numpy(dtype=float))
+    return df
+
+def scale_frames(frames, protocol, query, url=None, transport=post_query, response_cache=None):
+    pairs = {key: found for key, found in amount_pairs(protocol, query).items() if key in frames}
+    if url:
+        lookups = {}
+        for key, found in pairs.items():
+            df = frames[key]
+            for amount, token, token_type in found:
+                if amount in df.columns and token + SEPARATOR + 'decimals' not in df.columns and token + SEPARATOR + 'id' in df.columns:
+                    lookups.setdefault(token_type, set()).update(df[token + SEPARATOR + 'id'].dropna().unique())
+        prefetch_decimals(url, lookups, transport, response_cache)
+    for key, found in pairs.items():
+        scale_amounts(frames[key], found, url)
+    return frames
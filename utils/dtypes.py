@@ -0,0 +1,89 @@
+import re
+import numpy as np
+import pandas as pd
+from utils.frames import SEPARATOR
+from utils.graphql import GraphQLSyntaxError, InlineFragment, parse
+from utils.schema_model import load_schema
+from utils.validator import root_fields
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+CATEGORY_RATIO = 0.5
+TIMESTAMP_RE = re.compile(r'(^|_)timestamp$|Timestamp$')
+
+
+def column_types(protocol, query):
+    # {root key: [(column regex, graphql type, field name)]}, lists match any index.
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError:
+        return {}
+    schema = load_schema(protocol)
+    roots = root_fields(schema)
+    types = {}
+    for field in document.fields:
+        if field.name in roots:
+            patterns = []
+            leaf_types(schema, roots[field.name][0], field.selections, '', patterns)
+            types[field.key] = [(re.compile(pattern + '$'), type_name, name) for pattern, type_name, name in patterns]
+    return types
+
+def leaf_types(schema, type_name, selections, prefix, patterns):
+    schema_type = schema.types.get(type_name)
+    if schema_type is None:
+        return
+    for selection in selections:
+        if isinstance(selection, InlineFragment):
+            leaf_types(schema, selection.type_condition, selection.selections, prefix, patterns)
+            continue
+        definition = schema_type.fields.get(selection.name)
+        if definition is None:
+            continue
+        pattern = prefix + SEPARATOR + re.escape(selection.key) if prefix else re.escape(selection.key)
+        if definition.is_list:
+            pattern += SEPARATOR + r'\d+'
+        target = schema.types.get(definition.type_name)
+        if selection.selections:
+            leaf_types(schema, definition.type_name, selection.selections, pattern, patterns)
+        elif target is not None and target.kind == 'enum':
+            patterns.append((pattern, 'enum', selection.name))
+        else:
+            patterns.append((pattern, definition.type_name, selection.name))
+
+def big_integers(series):
+    # int64 when every value fits, otherwise exact decimal strings, Arrow and st.dataframe cannot hold wider ints.
+    values = [None if pd.isna(v) else int(v) for v in series]
+    present = [v for v in values if v is not None]
+    if all(INT64_MIN <= v <= INT64_MAX for v in present):
+        return pd.array(values, dtype='Int64') if len(present) < len(values) else np.array(values, dtype=np.int64)
+    return pd.Series([None if v is None else str(v) for v in values], index=series.index, dtype=object)
+
+def repetitive(series):
+    return len(series) > 1 and series.nunique(dropna=True) <= len(series) * CATEGORY_RATIO
+
+def convert(series, type_name, field_name):
+    if TIMESTAMP_RE.search(field_name) and type_name in ('Int', 'BigInt'):
+        return pd.to_datetime(pd.to_numeric(series, errors='coerce'), unit='s')
+    if type_name == 'BigInt':
+        return big_integers(series)
+    if type_name == 'Int':
+        values = pd.to_numeric(series, errors='coerce')
+        return values.astype('Int64') if values.isna().any() else values.astype(np.int64)
+    if type_name in ('BigDecimal', 'Float'):
+        return pd.to_numeric(series, errors='coerce')
+    if type_name == 'Boolean':
+        return series.astype('boolean')
+    if type_name == 'enum' or repetitive(series):
+        return series.astype('category')
+    return series
+
+def apply_types(df, types):
+    for column in df.columns:
+        for pattern, type_name, field_name in types:
+            if pattern.match(column):
+                try:
+                    df[column] = convert(df[column], type_name, field_name)
+                except (TypeError, ValueError, OverflowError):
+                    pass
+                break
+    return df
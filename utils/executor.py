@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.the_graph import apost_query
+
+MAX_CONCURRENCY = 16
+PER_ENDPOINT = 4
+
+
+class EndpointSlots:
+    # One semaphore per endpoint, asyncio ones for the executor, thread ones for limit_endpoints.
+
+    def __init__(self, per_endpoint=PER_ENDPOINT, semaphore=threading.BoundedSemaphore):
+        self.per_endpoint = per_endpoint
+        self.semaphore = semaphore
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            semaphore = self._semaphores.get(url)
+            if semaphore is None:
+                semaphore = self._semaphores[url] = self.semaphore(self.per_endpoint)
+        return semaphore
+
+
+def limit_endpoints(transport, per_endpoint=PER_ENDPOINT):
+    # Wraps a post_query-like transport so threads calling it share the per-endpoint cap.
+    slots = EndpointSlots(per_endpoint)
+
+    def send(url, query, **kwargs):
+        with slots.get(url):
+            return transport(url, query, **kwargs)
+    return send
+
+
+async def iter_queries(pairs, max_concurrency=MAX_CONCURRENCY, per_endpoint=PER_ENDPOINT):
+    # Yields (index, result) for each (url, query) pair in completion order.
+    pairs = list(pairs)
+    total = asyncio.Semaphore(max_concurrency)
+    endpoints = EndpointSlots(per_endpoint, asyncio.Semaphore)
+    pool = ThreadPoolExecutor(max_concurrency, thread_name_prefix='subgraph')
+
+    async def run(index, url, query):
+        async with endpoints.get(url), total:
+            return index, await apost_query(url, query, executor=pool)
+
+    tasks = [asyncio.ensure_future(run(i, url, query)) for i, (url, query) in enumerate(pairs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        pool.shutdown(wait=False)
@@ -0,0 +1,88 @@
+import json
+import math
+import tempfile
+
+CHUNK_ROWS = 5000
+SPOOL_BYTES = 2 * 1024 * 1024
+FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Parquet and Arrow exports need pyarrow, install it with `pip install pyarrow`')
+    return pyarrow
+
+def available_formats():
+    try:
+        _pyarrow()
+    except ImportError:
+        return ['CSV']
+    return list(FORMATS)
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    # Only one chunk of CSV text is alive at a time instead of the whole file twice.
+    yield df.head(0).to_csv(index=False).encode('utf-8')
+    for chunk in iter_chunks(df, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+def write_csv(df, sink, chunk_rows=CHUNK_ROWS):
+    for data in iter_csv(df, chunk_rows):
+        sink.write(data)
+
+def _plain(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return json.dumps(value)
+
+def arrow_frame(df):
+    # Arrow needs one type per column, nested leftovers and integers past int64 become text.
+    pa = _pyarrow()
+    try:
+        return df, pa.Schema.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        df = df.copy(deep=False)
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].map(_plain)
+        return df, pa.Schema.from_pandas(df, preserve_index=False)
+
+def iter_record_batches(df, schema, chunk_rows=CHUNK_ROWS):
+    pa = _pyarrow()
+    for chunk in iter_chunks(df, chunk_rows):
+        yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+def write_parquet(df, sink, chunk_rows=CHUNK_ROWS):
+    pa = _pyarrow()
+    df, schema = arrow_frame(df)
+    with pa.parquet.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in iter_record_batches(df, schema, chunk_rows):
+            writer.write_batch(batch)
+
+def write_arrow(df, sink, chunk_rows=CHUNK_ROWS):
+    pa = _pyarrow()
+    df, schema = arrow_frame(df)
+    with pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd')) as writer:
+        for batch in iter_record_batches(df, schema, chunk_rows):
+            writer.write_batch(batch)
+
+WRITERS = {'CSV': write_csv, 'Parquet': write_parquet, 'Arrow': write_arrow}
+
+def export_file(df, export_format='CSV', chunk_rows=CHUNK_ROWS):
+    # Small exports stay in memory, large ones spill to a temporary file while they are written.
+    writer = WRITERS[export_format]
+    sink = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    writer(df, sink, chunk_rows)
+    sink.seek(0)
+    return sink
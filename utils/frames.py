@@ -0,0 +1,98 @@
+import pandas as pd
+
+SEPARATOR = '_'
+MISSING = float('nan')
+
+
+class IrregularRows(Exception):
+    pass
+
+
+def row_shape(row):
+    if isinstance(row, dict) and row:
+        return {key: row_shape(value) for key, value in row.items()}
+    if isinstance(row, list) and row:
+        # List lengths differ between rows, so they go through the row by row walk.
+        raise IrregularRows()
+    return None
+
+def shaped_columns(rows, shape, name, columns, separator):
+    for key, child in shape.items():
+        values = [row[key] for row in rows]
+        column = name + separator + key if name else key
+        if child is None:
+            for value in values:
+                if value and isinstance(value, (dict, list)):
+                    raise IrregularRows()
+            columns[column] = values
+        else:
+            for value in values:
+                if len(value) != len(child):
+                    raise IrregularRows()
+            shaped_columns(values, child, column, columns, separator)
+
+def walked_columns(results, separator):
+    columns = {}
+    count = 0
+
+    def visit(value, name):
+        if isinstance(value, dict) and value:
+            for key, item in value.items():
+                visit(item, name + separator + key if name else key)
+        elif isinstance(value, list) and value:
+            for index, item in enumerate(value):
+                visit(item, '%s%s%d' % (name, separator, index) if name else str(index))
+        else:
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = [MISSING] * count
+            elif len(column) < count:
+                column.extend([MISSING] * (count - len(column)))
+            column.append(value)
+
+    for result in results:
+        visit(result, '')
+        count += 1
+    for column in columns.values():
+        if len(column) < count:
+            column.extend([MISSING] * (count - len(column)))
+    return columns
+
+def flatten_columns(results, separator=SEPARATOR):
+    # Same column names as flatten_json.flatten, but filled per column instead of per row.
+    # Rows of one GraphQL selection almost always share a shape, which lets whole columns be
+    # pulled out with one list comprehension each. Anything else falls back to a row walk.
+    results = list(results)
+    if not results:
+        return {}
+    try:
+        shape = row_shape(results[0])
+        if not isinstance(shape, dict):
+            raise IrregularRows()
+        for row in results:
+            if len(row) != len(shape):
+                raise IrregularRows()
+        columns = {}
+        shaped_columns(results, shape, '', columns, separator)
+        return columns
+    except (IrregularRows, KeyError, TypeError):
+        return walked_columns(results, separator)
+
+def results_frame(results):
+    results = list(results)
+    return pd.DataFrame(flatten_columns(results), index=pd.RangeIndex(len(results)))
+
+def result_frames(data, column_types=None):
+    # One frame per root field, single entity lookups become one row frames.
+    # column_types comes from utils.dtypes.column_types and types the columns as they are built.
+    from utils.dtypes import apply_types
+    frames = {}
+    for key, value in data.items():
+        if value is None:
+            value = []
+        elif isinstance(value, dict):
+            value = [value]
+        frames[key] = results_frame(value)
+        if column_types and key in column_types:
+            apply_types(frames[key], column_types[key])
+    return frames
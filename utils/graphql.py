@@ -0,0 +1,246 @@
+import json
+import re
+
+TOKEN_RE = re.compile(r'''
+    (?P<ignore>[\s,]+|\#[^\n]*)
+  | (?P<spread>\.\.\.)
+  | (?P<string>"""(?:.|\n)*?"""|"(?:[^"\\\n]|\\.)*")
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<punct>[!$&():=@\[\]{}|])
+''', re.VERBOSE)
+
+
+class GraphQLSyntaxError(ValueError):
+    pass
+
+
+class Enum(str):
+    pass
+
+
+class Variable(str):
+    pass
+
+
+class Field:
+    def __init__(self, name, alias=None, arguments=None, selections=None):
+        self.name = name
+        self.alias = alias
+        self.arguments = arguments if arguments is not None else {}
+        self.selections = selections if selections is not None else []
+
+    @property
+    def key(self):
+        return self.alias or self.name
+
+    def field(self, name):
+        for selection in self.selections:
+            if isinstance(selection, Field) and selection.key == name:
+                return selection
+
+    def __repr__(self):
+        return 'Field(%r)' % render_selection(self)
+
+
+class InlineFragment:
+    def __init__(self, type_condition, selections=None):
+        self.type_condition = type_condition
+        self.selections = selections if selections is not None else []
+
+
+class Document:
+    def __init__(self, selections=None, operation='query', name=None, variables=''):
+        self.selections = selections if selections is not None else []
+        self.operation = operation
+        self.name = name
+        self.variables = variables
+
+    @property
+    def fields(self):
+        return [s for s in self.selections if isinstance(s, Field)]
+
+    def field(self, name):
+        for field in self.fields:
+            if field.key == name:
+                return field
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if not match:
+            raise GraphQLSyntaxError('Unexpected character %r at %d' % (text[pos], pos))
+        pos = match.end()
+        if match.lastgroup != 'ignore':
+            tokens.append((match.lastgroup, match.group(), match.start()))
+    return tokens
+
+
+class Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, value=None):
+        if self.pos >= len(self.tokens):
+            return None
+        token = self.tokens[self.pos]
+        if value is not None and token[1] != value:
+            return None
+        return token
+
+    def next(self):
+        if self.pos >= len(self.tokens):
+            raise GraphQLSyntaxError('Unexpected end of query')
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value:
+            raise GraphQLSyntaxError('Expected %r but found %r at %d' % (value, token[1], token[2]))
+        return token
+
+    def expect_name(self):
+        token = self.next()
+        if token[0] != 'name':
+            raise GraphQLSyntaxError('Expected a name but found %r at %d' % (token[1], token[2]))
+        return token[1]
+
+    def parse_document(self):
+        document = Document()
+        token = self.peek()
+        if token and token[1] in ('query', 'subscription'):
+            document.operation = self.next()[1]
+            if self.peek() and self.peek()[0] == 'name':
+                document.name = self.next()[1]
+            if self.peek('('):
+                start = self.next()[2]
+                depth = 1
+                while depth:
+                    token = self.next()
+                    depth += {'(': 1, ')': -1}.get(token[1], 0)
+                document.variables = self.text[start:token[2] + 1]
+        document.selections = self.parse_selection_set()
+        if self.peek() is not None:
+            token = self.peek()
+            raise GraphQLSyntaxError('Unexpected %r after query at %d' % (token[1], token[2]))
+        return document
+
+    def parse_selection_set(self):
+        self.expect('{')
+        selections = []
+        while not self.peek('}'):
+            selections.append(self.parse_selection())
+        self.expect('}')
+        return selections
+
+    def parse_selection(self):
+        if self.peek('...'):
+            self.next()
+            self.expect('on')
+            type_condition = self.expect_name()
+            return InlineFragment(type_condition, self.parse_selection_set())
+        name = self.expect_name()
+        alias = None
+        if self.peek(':'):
+            self.next()
+            alias, name = name, self.expect_name()
+        field = Field(name, alias)
+        if self.peek('('):
+            self.next()
+            while not self.peek(')'):
+                arg = self.expect_name()
+                self.expect(':')
+                field.arguments[arg] = self.parse_value()
+            self.expect(')')
+        if self.peek('{'):
+            field.selections = self.parse_selection_set()
+        return field
+
+    def parse_value(self):
+        kind, value, _ = self.next()
+        if kind == 'number':
+            return float(value) if any(c in value for c in '.eE') else int(value)
+        if kind == 'string':
+            if value.startswith('"""'):
+                return value[3:-3]
+            # GraphQL string escapes are the JSON ones, json keeps non-ASCII text intact.
+            try:
+                return json.loads(value)
+            except ValueError:
+                raise GraphQLSyntaxError('Invalid string %s' % value)
+        if kind == 'name':
+            return {'true': True, 'false': False, 'null': None}.get(value, Enum(value))
+        if value == '$':
+            return Variable(self.expect_name())
+        if value == '[':
+            items = []
+            while not self.peek(']'):
+                items.append(self.parse_value())
+            self.next()
+            return items
+        if value == '{':
+            fields = {}
+            while not self.peek('}'):
+                key = self.expect_name()
+                self.expect(':')
+                fields[key] = self.parse_value()
+            self.next()
+            return fields
+        raise GraphQLSyntaxError('Unexpected %r in value' % value)
+
+
+def parse(text):
+    return Parser(text).parse_document()
+
+
+def render_value(value):
+    if isinstance(value, Variable):
+        return '$' + value
+    if isinstance(value, Enum):
+        return str(value)
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return '[%s]' % ', '.join(render_value(v) for v in value)
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join('%s: %s' % (k, render_value(v)) for k, v in value.items())
+    raise TypeError('Cannot render %r as a GraphQL value' % (value,))
+
+
+def render_selection(selection, indent=0):
+    pad = '  ' * indent
+    if isinstance(selection, InlineFragment):
+        head = '... on %s' % selection.type_condition
+    else:
+        head = selection.name
+        if selection.alias:
+            head = '%s: %s' % (selection.alias, head)
+        if selection.arguments:
+            head += '(%s)' % ', '.join(
+                '%s: %s' % (k, render_value(v)) for k, v in selection.arguments.items()
+            )
+    if not selection.selections:
+        return pad + head
+    body = '\n'.join(render_selection(s, indent + 1) for s in selection.selections)
+    return '%s%s {\n%s\n%s}' % (pad, head, body, pad)
+
+
+def render(document):
+    body = '\n'.join(render_selection(s, 1) for s in document.selections)
+    head = ''
+    if document.name or document.variables:
+        head = '%s %s%s ' % (document.operation, document.name or '', document.variables)
+    return '%s{\n%s\n}' % (head, body)
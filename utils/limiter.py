@@ -0,0 +1,211 @@
+import contextlib
+import threading
+import time
+
+RATE = 20.0
+BURST = 40
+INITIAL_CONCURRENCY = 8
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+DECREASE = 0.5
+LATENCY_SPIKE = 3.0
+SMOOTHING = 0.1
+CONGESTION_STATUSES = (429, 500, 502, 503, 504)
+PREFIX = 'ai_graph_endpoint'
+
+
+class TokenBucket:
+    def __init__(self, rate=RATE, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # Nothing accrues while paused, the bucket restarts empty once the pause is over.
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        # Blocks until a token is free, returns the seconds spent waiting.
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    # AIMD: the limit grows by one per limit's worth of healthy responses that found it fully used
+    # and halves on throttling, server errors or a latency spike, at most once per round trip.
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.latency = None
+        self.decreases = 0
+        self.last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        start = time.monotonic()
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, seconds, congested):
+        with self._condition:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            now = time.monotonic()
+            spike = self.latency is not None and seconds > LATENCY_SPIKE * self.latency
+            if congested or spike:
+                if now - self.last_decrease > (self.latency or seconds):
+                    self.limit = max(self.minimum, self.limit * DECREASE)
+                    self.last_decrease = now
+                    self.decreases += 1
+            elif saturated:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            if not congested:
+                self.latency = seconds if self.latency is None else (1 - SMOOTHING) * self.latency + SMOOTHING * seconds
+            self._condition.notify_all()
+
+
+class Slot:
+    def __init__(self):
+        self.status = None
+
+
+class EndpointLimiter:
+    def __init__(self, rate=RATE, burst=BURST, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY,
+                 maximum=MAX_CONCURRENCY):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial, minimum, maximum)
+        self.requests = 0
+        self.congested = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def slot(self):
+        # The caller sets slot.status, a request that raises or ends without one counts as congestion.
+        waited = self.concurrency.acquire()
+        slot = Slot()
+        start = None
+        try:
+            waited += self.bucket.acquire()
+            start = time.monotonic()
+            yield slot
+        finally:
+            seconds = time.monotonic() - start if start is not None else 0.0
+            congested = start is not None and (slot.status is None or slot.status in CONGESTION_STATUSES)
+            self.concurrency.release(seconds, congested)
+            with self._lock:
+                self.requests += start is not None
+                self.congested += congested
+                self.waited += waited
+
+    def metrics(self):
+        concurrency = self.concurrency
+        return {
+            'rate': self.bucket.rate,
+            'tokens': round(self.bucket.tokens, 3),
+            'paused': max(self.bucket.paused_until - time.monotonic(), 0.0) > 0,
+            'concurrency_limit': round(concurrency.limit, 3),
+            'in_flight': concurrency.in_flight,
+            'latency_seconds': round(concurrency.latency or 0.0, 6),
+            'decreases': concurrency.decreases,
+            'requests': self.requests,
+            'congested': self.congested,
+            'wait_seconds': round(self.waited, 6),
+        }
+
+
+class Limiters:
+    # One limiter per endpoint, created on first use from the defaults or a configure() override.
+
+    def __init__(self, enabled=True, **settings):
+        self.enabled = enabled
+        self.settings = settings
+        self.overrides = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def configure(self, url=None, **settings):
+        with self._lock:
+            if url is None:
+                self.settings.update(settings)
+                self._limiters.clear()
+            else:
+                self.overrides.setdefault(url, {}).update(settings)
+                self._limiters.pop(url, None)
+
+    def get(self, url):
+        with self._lock:
+            limiter = self._limiters.get(url)
+            if limiter is None:
+                limiter = self._limiters[url] = EndpointLimiter(**dict(self.settings, **self.overrides.get(url, {})))
+        return limiter
+
+    def slot(self, url):
+        if not self.enabled:
+            return contextlib.nullcontext(Slot())
+        return self.get(url).slot()
+
+    def pause(self, url, seconds):
+        if self.enabled:
+            self.get(url).bucket.pause(seconds)
+
+    def metrics(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {url: limiter.metrics() for url, limiter in limiters.items()}
+
+    def prometheus(self):
+        metrics = self.metrics()
+        lines = []
+        for name, kind, key in (
+            ('concurrency_limit', 'gauge', 'concurrency_limit'),
+            ('in_flight', 'gauge', 'in_flight'),
+            ('tokens', 'gauge', 'tokens'),
+            ('latency_seconds', 'gauge', 'latency_seconds'),
+            ('requests_total', 'counter', 'requests'),
+            ('congested_total', 'counter', 'congested'),
+            ('decreases_total', 'counter', 'decreases'),
+            ('wait_seconds_total', 'counter', 'wait_seconds'),
+        ):
+            lines.append('# TYPE %s_%s %s' % (PREFIX, name, kind))
+            for url, values in sorted(metrics.items()):
+                lines.append('%s_%s{endpoint="%s"} %s' % (PREFIX, name, url.replace('"', '\\"'), float(values[key])))
+        return '\n'.join(lines) + '\n'
+
+
+LIMITERS = Limiters()
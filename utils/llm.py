@@ -0,0 +1,147 @@
+import hashlib
+import re
+from utils.cache import LLMCache
+from utils.classifier import THRESHOLD, classify_protocol
+from utils.prompts import one_shot_prompt, protocol_selection_prompt, query_prompt
+from utils.schema_slice import entity_index
+from utils.schemas import SCHEMAS
+from utils.tracing import TRACER
+
+LLM_CACHE = LLMCache()
+
+
+class QueryExtractor:
+    # Follows the streamed answer and notices when the first top level {...} block closes.
+
+    def __init__(self):
+        self.text = ''
+        self.start = -1
+        self.end = -1
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    @property
+    def done(self):
+        return self.end >= 0
+
+    @property
+    def query(self):
+        if self.done:
+            return self.text[self.start:self.end + 1]
+        return self.text[self.text.find('{'): self.text.rfind('}') + 1]
+
+    def feed(self, chunk):
+        offset = len(self.text)
+        self.text += chunk
+        if self.done:
+            return True
+        for index, char in enumerate(chunk, offset):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.start >= 0:
+                self.in_string = True
+            elif char == '{':
+                if self.start < 0:
+                    self.start = index
+                self.depth += 1
+            elif char == '}' and self.start >= 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = index
+                    return True
+        return False
+
+
+def normalize_request(text):
+    return re.sub(r'\s+', ' ', text).strip().lower().rstrip('.!?')
+
+def content_hash(*parts):
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+def stream_answer(chatbot, prompt):
+    if hasattr(chatbot, 'ask_stream'):
+        return chatbot.ask_stream(prompt)
+    return iter([chatbot.ask(prompt)])
+
+def confident_protocol(user_input, threshold=THRESHOLD):
+    protocol, confidence = classify_protocol(user_input)
+    if protocol and confidence >= threshold:
+        return protocol
+
+def detect_protocol(chatbot, user_input, cache=LLM_CACHE, threshold=THRESHOLD, on_token=None):
+    protocol = confident_protocol(user_input, threshold)
+    if protocol:
+        return protocol
+
+    def ask():
+        answer = ''
+        with TRACER.span('llm', prompt='protocol_selection_prompt') as span:
+            for chunk in stream_answer(chatbot, protocol_selection_prompt%(user_input)):
+                answer += chunk
+                if on_token:
+                    on_token(answer)
+            span.set(bytes=len(answer.encode('utf-8')))
+        return ''.join(filter(str.isalnum, answer)).lower()
+
+    key = ('protocol', normalize_request(user_input), content_hash(protocol_selection_prompt))
+    return cache.get_or_ask(key, ask)
+
+def read_query(stream, on_token=None):
+    # Stop reading as soon as the query's braces balance, anything after it is chatter.
+    extractor = QueryExtractor()
+    try:
+        for chunk in stream:
+            done = extractor.feed(chunk)
+            if on_token:
+                on_token(extractor.text)
+            if done:
+                break
+    finally:
+        if hasattr(stream, 'close'):
+            stream.close()
+    return extractor.text
+
+def write_query(chatbot, protocol, user_input, schema, cache=LLM_CACHE, on_token=None):
+    def ask():
+        with TRACER.span('llm', prompt='query_prompt', protocol=protocol) as span:
+            answer = read_query(stream_answer(chatbot, query_prompt%(protocol, user_input, schema)), on_token)
+            span.set(bytes=len(answer.encode('utf-8')))
+        return answer
+
+    key = ('query', normalize_request(user_input), protocol, content_hash(query_prompt, schema))
+    return cache.get_or_ask(key, ask)
+
+def one_shot_index():
+    return '\n\n'.join('%s:\n%s' % (protocol, entity_index(protocol)) for protocol in SCHEMAS)
+
+def parse_one_shot(answer):
+    match = re.search(r'protocol\W*([A-Za-z]+)', answer, re.IGNORECASE)
+    protocol = match.group(1).lower() if match else None
+    query = extract_query(answer[match.end():] if match else answer)
+    if protocol not in SCHEMAS or not query:
+        return None, None
+    return protocol, query
+
+def write_query_one_shot(chatbot, user_input, cache=LLM_CACHE, on_token=None):
+    # Protocol and query from a single round trip, (None, None) when the answer cannot be parsed.
+    index = one_shot_index()
+
+    def ask():
+        with TRACER.span('llm', prompt='one_shot_prompt') as span:
+            answer = read_query(stream_answer(chatbot, one_shot_prompt%(index, user_input)), on_token)
+            span.set(bytes=len(answer.encode('utf-8')))
+        return answer
+
+    key = ('one_shot', normalize_request(user_input), content_hash(one_shot_prompt, index))
+    return parse_one_shot(cache.get_or_ask(key, ask))
+
+def extract_query(text):
+    extractor = QueryExtractor()
+    extractor.feed(text)
+    return extractor.query
@@ -0,0 +1,79 @@
+import re
+import threading
+import time
+from utils.classifier import classify_protocol
+from utils.schema_model import load_schema
+from utils.schema_slice import rank_entities
+from utils.schemas import SCHEMAS
+from utils.sdl import SCALARS
+from utils.validator import lower_first, plural
+
+DEFAULT_PROTOCOL = 'uniswap'
+DEFAULT_FIRST = 10
+CHUNK_CHARS = 4
+
+REQUEST_RE = re.compile(r'Here is the request: (?P<request>.*?)\n')
+QUERY_PROMPT_RE = re.compile(r"schema for (?P<protocol>\w+)'s subgraph.*?write me a query for the (?P<request>.*?)\.\nThe query language", re.S)
+
+
+def mock_protocol(user_input):
+    protocol, _ = classify_protocol(user_input)
+    return protocol or DEFAULT_PROTOCOL
+
+def mock_query(protocol, user_input):
+    # The best ranked entity with its scalar fields, newest first when it has a timestamp.
+    schema = load_schema(protocol)
+    ranked, _ = rank_entities(protocol, user_input)
+    entities = [name for name in ranked if schema.types[name].kind == 'type'] or list(schema.entities)
+    entity = schema.types[entities[0]]
+    fields = [
+        field.name for field in entity.fields.values()
+        if not field.is_list and (field.type_name in SCALARS or getattr(schema.types.get(field.type_name), 'kind', None) == 'enum')
+    ]
+    number = re.search(r'\d+', user_input)
+    arguments = 'first: %d' % (int(number.group()) if number else DEFAULT_FIRST)
+    if 'timestamp' in entity.fields:
+        arguments += ', orderBy: timestamp, orderDirection: desc'
+    return '{\n  %s(%s) {\n    %s\n  }\n}' % (plural(lower_first(entity.name)), arguments, '\n    '.join(fields))
+
+
+class MockChatbot:
+    # Deterministic stand-in for revChatGPT's Chatbot, answers are derived from the prompt alone.
+    # latency is paid before the first chunk, token_latency before every following one.
+
+    def __init__(self, latency=0.0, token_latency=0.0, answers=None):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answers = answers or {}
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def answer(self, prompt):
+        for marker, answer in self.answers.items():
+            if marker in prompt:
+                return answer
+        match = QUERY_PROMPT_RE.search(prompt)
+        if match:
+            return mock_query(match.group('protocol'), match.group('request'))
+        match = REQUEST_RE.search(prompt)
+        request = match.group('request') if match else prompt
+        protocol = mock_protocol(request)
+        if prompt.rstrip().endswith('<the GraphQL query>'):
+            if protocol not in SCHEMAS:
+                protocol = DEFAULT_PROTOCOL
+            return 'protocol: %s\n%s' % (protocol, mock_query(protocol, request))
+        return protocol
+
+    def ask_stream(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        answer = self.answer(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        for start in range(0, len(answer), CHUNK_CHARS):
+            if start and self.token_latency:
+                time.sleep(self.token_latency)
+            yield answer[start:start + CHUNK_CHARS]
+
+    def ask(self, prompt):
+        return ''.join(self.ask_stream(prompt))
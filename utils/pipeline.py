@@ -0,0 +1,122 @@
+import contextlib
+import time
+from utils.decimals import scale_frames
+from utils.dtypes import column_types
+from utils.frames import result_frames
+from utils.llm import LLM_CACHE, confident_protocol, detect_protocol, extract_query, write_query, write_query_one_shot
+from utils.schema_slice import slice_schema
+from utils.schemas import SCHEMAS
+from utils.the_graph import post_query
+from utils.tracing import TRACER
+from utils.urls import URLS
+from utils.validator import repair_query
+
+STAGES = ('protocol', 'query', 'fetch', 'frames')
+
+
+class PipelineResult:
+    def __init__(self, user_input, protocol=None, query=None):
+        self.user_input = user_input
+        self.protocol = protocol
+        self.query = query
+        self.issues = []
+        self.response = None
+        self.frames = {}
+        self.timings = {}
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+
+class Pipeline:
+    # The request-to-frames flow of app.py without Streamlit, every backend can be swapped.
+    # chatbot is a zero-argument factory, each LLM stage starts a fresh conversation.
+    # transport is called as transport(url, query, cache=...) and returns the decoded GraphQL response.
+
+    def __init__(self, chatbot, transport=post_query, urls=URLS, llm_cache=LLM_CACHE, response_cache=None,
+                 one_shot=True, scale=True, tracer=TRACER):
+        self.chatbot = chatbot
+        self.transport = transport
+        self.urls = urls
+        self.llm_cache = llm_cache
+        self.response_cache = response_cache
+        self.one_shot = one_shot
+        self.scale = scale
+        self.tracer = tracer
+
+    @contextlib.contextmanager
+    def stage(self, result, name, **labels):
+        start = time.perf_counter()
+        with self.tracer.span(name, **labels) as span:
+            try:
+                yield span
+            finally:
+                span.set(protocol=result.protocol)
+                result.timings[name] = result.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def wants_one_shot(self, user_input):
+        return self.one_shot and not confident_protocol(user_input)
+
+    def detect(self, result, on_token=None):
+        if result.protocol:
+            return result
+        with self.stage(result, 'protocol'):
+            if self.wants_one_shot(result.user_input):
+                result.protocol, result.query = write_query_one_shot(
+                    self.chatbot(), result.user_input, self.llm_cache, on_token)
+            if not result.protocol:
+                result.protocol = detect_protocol(self.chatbot(), result.user_input, self.llm_cache, on_token=on_token)
+        return result
+
+    def write(self, result, on_token=None):
+        if result.protocol not in SCHEMAS or result.protocol not in self.urls:
+            result.error = "unsupported protocol '%s'" % result.protocol
+            return result
+        with self.stage(result, 'query'):
+            if not result.query:
+                schema = slice_schema(result.protocol, result.user_input)
+                result.query = write_query(self.chatbot(), result.protocol, result.user_input, schema, self.llm_cache, on_token)
+            result.query, result.issues = repair_query(result.protocol, extract_query(result.query))
+        if result.issues:
+            result.error = '\n'.join(str(issue) for issue in result.issues)
+        return result
+
+    def fetch(self, result):
+        with self.stage(result, 'fetch') as span:
+            result.response = self.transport(self.urls[result.protocol], result.query, cache=self.response_cache)
+            data = (result.response or {}).get('data') or {}
+            span.set(rows=sum(len(rows) for rows in data.values() if isinstance(rows, list)), entity='+'.join(data))
+        # Subgraphs answer failed queries with errors and null or partial data, none of it is worth framing.
+        if not result.response or not isinstance(result.response.get('data'), dict) or result.response.get('errors'):
+            result.error = str(result.response)
+        return result
+
+    def build_frames(self, result):
+        with self.stage(result, 'frames', entity='+'.join(result.response['data'])) as span:
+            types = column_types(result.protocol, result.query)
+            result.frames = result_frames(result.response['data'], types)
+            if self.scale:
+                scale_frames(result.frames, result.protocol, result.query, self.urls[result.protocol], self.transport,
+                             self.response_cache)
+            span.set(rows=sum(len(df) for df in result.frames.values()),
+                     bytes=sum(int(df.memory_usage(deep=False).sum()) for df in result.frames.values()))
+        return result
+
+    def run(self, user_input, on_token=None, frames=True):
+        # frames=False stops after the fetch, for callers that only need the response.
+        result = PipelineResult(user_input)
+        with self.tracer.trace(user_input):
+            for step in (self.detect, self.write):
+                step(result, on_token)
+                if not result.ok:
+                    return result
+            self.fetch(result)
+            if result.ok and frames:
+                self.build_frames(result)
+        return result
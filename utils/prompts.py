@@ -21,3 +21,15 @@ I want you to give me only the code. Do not start with "here is ..." or do not e
 
 %s
 '''
+
+
+one_shot_prompt = '''I will write a request to you. Answer it with a GraphQL query for one of the subgraphs below.
+Each subgraph lists its entities as Entity(fields), a field written as name:Entity points to another entity.
+
+%s
+
+Here is the request: %s
+
+Your answer must have exactly this form and nothing else:
+protocol: <the subgraph name from the list above>
+<the GraphQL query>'''
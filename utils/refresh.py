@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from utils.cache import normalize_query
+from utils.graphql import Field, GraphQLSyntaxError, parse, render
+from utils.schema_model import load_schema
+from utils.the_graph import QueryError, post_query
+from utils.validator import root_fields
+
+WATERMARK_FIELDS = ('timestamp', 'blockNumber')
+MAX_STATES = 32
+
+
+def sort_value(value):
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+def watermark_field(protocol, root):
+    # Only newest-first "latest N" reads refresh incrementally, one request for newer rows replaces them.
+    arguments = root.arguments
+    order_by = arguments.get('orderBy')
+    if order_by not in WATERMARK_FIELDS or arguments.get('orderDirection') != 'desc':
+        return None
+    if not isinstance(arguments.get('first'), int) or arguments.get('skip'):
+        return None
+    entity = root_fields(load_schema(protocol)).get(root.name, (None,))[0]
+    if entity and order_by in load_schema(protocol).types[entity].fields:
+        return order_by
+
+
+class IncrementalRefresher:
+    # Remembers the rows and high-water mark per (endpoint, query) and only pulls newer rows afterwards.
+    # The max_states most recently refreshed queries are kept.
+
+    def __init__(self, max_states=MAX_STATES):
+        self.max_states = max_states
+        self.states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def refresh(self, url, query, protocol, cache=None):
+        try:
+            document = parse(query)
+        except GraphQLSyntaxError:
+            return post_query(url, query, cache=cache)
+        if len(document.fields) != 1:
+            return post_query(url, query, cache=cache)
+        root = document.fields[0]
+        field = watermark_field(protocol, root)
+        if field is None:
+            return post_query(url, query, cache=cache)
+
+        injected = [name for name in dict.fromkeys(('id', field)) if not root.field(name)]
+        root.selections.extend(Field(name) for name in injected)
+        key = (url, normalize_query(query))
+        with self._lock:
+            state = self.states.get(key)
+
+        if state is None:
+            result = post_query(url, render(document), cache=cache)
+            if not isinstance(result.get('data'), dict) or result.get('errors'):
+                return result
+            rows = result['data'].get(root.key) or []
+        else:
+            try:
+                rows = self.merge(state['rows'], self.fetch_delta(url, document, root, field, state['watermark']), root)
+            except QueryError as e:
+                return e.response or {'errors': [{'message': str(e)}]}
+
+        watermark = max((row[field] for row in rows), key=sort_value, default=None)
+        with self._lock:
+            self.states[key] = {'rows': rows, 'watermark': watermark if watermark is not None else (state or {}).get('watermark')}
+            self.states.move_to_end(key)
+            while len(self.states) > self.max_states:
+                self.states.popitem(last=False)
+        return {'data': {root.key: [{k: v for k, v in row.items() if k not in injected} for row in rows]}}
+
+    def fetch_delta(self, url, document, root, field, watermark):
+        # _gte rather than _gt so rows sharing the watermark's timestamp are not lost, ids dedupe them.
+        arguments = root.arguments
+        saved = dict(arguments)
+        where = dict(arguments.get('where') or {})
+        if watermark is not None:
+            where[field + '_gte'] = watermark
+        arguments['where'] = where
+        try:
+            result = post_query(url, render(document))
+        finally:
+            arguments.clear()
+            arguments.update(saved)
+        if not isinstance(result.get('data'), dict) or result.get('errors'):
+            raise QueryError('Refresh request failed: %s' % (result,), result)
+        return result['data'].get(root.key) or []
+
+    def merge(self, rows, delta, root):
+        merged = {row['id']: row for row in rows}
+        merged.update((row['id'], row) for row in delta)
+        rows = list(merged.values())
+        order_by = root.arguments.get('orderBy')
+        if order_by is not None:
+            rows.sort(key=lambda row: sort_value(row.get(order_by)), reverse=root.arguments.get('orderDirection') == 'desc')
+        first = root.arguments.get('first')
+        return rows[:first] if isinstance(first, int) else rows
+
+    def forget(self, url=None):
+        with self._lock:
+            for key in [k for k in self.states if url is None or k[0] == url]:
+                del self.states[key]
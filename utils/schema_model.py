@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import threading
+from utils.schemas import SCHEMAS
+from utils.sdl import Schema, SchemaField, SchemaType, parse_sdl
+
+# Bump when the parsed classes change shape so stale cache files are ignored.
+MODEL_VERSION = 2
+# Next to the code rather than the working directory, so no caller reads a model someone else left behind.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'schemas')
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def schema_digest(text):
+    return hashlib.sha256(('%d\n%s' % (MODEL_VERSION, text)).encode('utf-8')).hexdigest()[:16]
+
+def load_schema(protocol, cache_dir=CACHE_DIR):
+    # Parsed on first use per protocol, then kept in memory and stored as JSON next to a content hash.
+    schema = _loaded.get(protocol)
+    if schema is not None:
+        return schema
+    with _lock:
+        if protocol in _loaded:
+            return _loaded[protocol]
+        text = SCHEMAS[protocol]
+        path = cache_dir and os.path.join(cache_dir, '%s-%s.json' % (protocol, schema_digest(text)))
+        schema = _read(path) if path else None
+        if schema is None:
+            schema = Schema(parse_sdl(text))
+            if path:
+                _write(path, schema)
+        _loaded[protocol] = schema
+        return schema
+
+def schema_to_dict(schema):
+    return {
+        name: {
+            'kind': t.kind,
+            'fields': [[f.name, f.type_name, f.is_list, f.non_null, f.type, f.derived_from] for f in t.fields.values()],
+            'values': t.values,
+            'interfaces': t.interfaces,
+            'directives': t.directives,
+        }
+        for name, t in schema.types.items()
+    }
+
+def schema_from_dict(data):
+    return Schema({
+        name: SchemaType(name, t['kind'], {f[0]: SchemaField(*f) for f in t['fields']}, t['values'], t['interfaces'],
+                         t['directives'])
+        for name, t in data.items()
+    })
+
+def _read(path):
+    # Any unreadable or stale file is a miss, the schema is parsed again and the file rewritten.
+    try:
+        with open(path, encoding='utf-8') as f:
+            return schema_from_dict(json.load(f))
+    except Exception:
+        return None
+
+def _write(path, schema):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(schema_to_dict(schema), f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
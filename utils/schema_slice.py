@@ -0,0 +1,86 @@
+import sys
+from utils.classifier import stem, terms
+from utils.schemas import SCHEMAS
+from utils.schema_model import load_schema
+from utils.sdl import references, render_type
+
+MAX_ENTITIES = 3
+ENTITY_SCORE = 3
+FIELD_SCORE = 1
+
+
+def schema_types(protocol):
+    return load_schema(protocol).types
+
+def rank_entities(protocol, user_input):
+    # The protocol's own name matches its top level entity in almost every request, it says nothing about the data.
+    words = terms(user_input) - {stem(protocol)}
+    scores = {}
+    for name, schema_type in schema_types(protocol).items():
+        if schema_type.kind not in ('type', 'interface'):
+            continue
+        score = ENTITY_SCORE if stem(name) in words else 0
+        score += FIELD_SCORE * sum(1 for field in schema_type.fields if stem(field) in words)
+        if score:
+            scores[name] = score
+    return sorted(scores, key=lambda name: -scores[name]), scores
+
+def slice_schema(protocol, user_input, max_entities=MAX_ENTITIES):
+    # Matched entities are rendered in full, the types they reference only with their scalar fields.
+    types = schema_types(protocol)
+    ranked, scores = rank_entities(protocol, user_input)
+    if not ranked:
+        return render_schema(protocol)
+    best = scores[ranked[0]]
+    selected = [name for name in ranked[:max_entities] if scores[name] * 2 >= best]
+    graph = references(types)
+    related = []
+    for name in selected:
+        for ref in sorted(graph[name]):
+            if ref not in selected and ref not in related:
+                related.append(ref)
+    for name in list(related):
+        for ref in sorted(graph[name]):
+            if types[ref].kind == 'enum' and ref not in selected and ref not in related:
+                related.append(ref)
+    blocks = [render_type(types[name]) for name in selected]
+    blocks += [render_type(types[name], scalars_only=True, types=types) for name in related]
+    return '\n\n'.join(blocks)
+
+def entity_index(protocol):
+    # One line per entity with bare field names, relations keep their target type.
+    types = schema_types(protocol)
+    lines = []
+    for name, schema_type in types.items():
+        if schema_type.kind != 'type':
+            continue
+        fields = []
+        for field in schema_type.fields.values():
+            related = types.get(field.type_name)
+            if related and related.kind in ('type', 'interface'):
+                fields.append('%s:%s' % (field.name, field.type_name))
+            else:
+                fields.append(field.name)
+        lines.append('%s(%s)' % (name, ' '.join(fields)))
+    return '\n'.join(lines)
+
+def render_schema(protocol):
+    return '\n\n'.join(render_type(t) for t in schema_types(protocol).values())
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English and code with the OpenAI tokenizers.
+    return (len(text) + 3) // 4
+
+def token_savings(user_input, protocols=None):
+    report = {}
+    for protocol in protocols or SCHEMAS:
+        full = estimate_tokens(SCHEMAS[protocol])
+        sliced = estimate_tokens(slice_schema(protocol, user_input))
+        report[protocol] = {'full': full, 'sliced': sliced, 'saved': 1 - sliced / full}
+    return report
+
+
+if __name__ == '__main__':
+    user_input = ' '.join(sys.argv[1:]) or 'show me the latest 50 swaps'
+    for protocol, row in token_savings(user_input).items():
+        print('%-14s %6d -> %6d tokens (%.0f%% saved)' % (protocol, row['full'], row['sliced'], row['saved'] * 100))
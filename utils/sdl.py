@@ -0,0 +1,202 @@
+from utils.graphql import GraphQLSyntaxError, Parser
+
+SCALARS = ('ID', 'String', 'Int', 'Float', 'Boolean', 'BigInt', 'BigDecimal', 'Bytes')
+
+
+class SchemaField:
+    def __init__(self, name, type_name, is_list=False, non_null=False, type=None, derived_from=None):
+        self.name = name
+        self.type_name = type_name
+        self.is_list = is_list
+        self.non_null = non_null
+        self.type = type or type_name
+        self.derived_from = derived_from
+
+    def __repr__(self):
+        return 'SchemaField(%r, %r)' % (self.name, self.type_name)
+
+
+class SchemaType:
+    def __init__(self, name, kind, fields=None, values=None, interfaces=None, directives=None):
+        self.name = name
+        self.kind = kind
+        self.fields = fields if fields is not None else {}
+        self.values = values if values is not None else []
+        self.interfaces = interfaces if interfaces is not None else []
+        self.directives = directives if directives is not None else {}
+
+    @property
+    def is_entity(self):
+        return self.kind == 'type' and 'entity' in self.directives
+
+    def __repr__(self):
+        return 'SchemaType(%r, %r)' % (self.name, self.kind)
+
+
+class Schema:
+    def __init__(self, types):
+        self.types = types
+
+    def of_kind(self, kind):
+        return {name: t for name, t in self.types.items() if t.kind == kind}
+
+    @property
+    def entities(self):
+        return {name: t for name, t in self.types.items() if t.is_entity}
+
+    @property
+    def enums(self):
+        return self.of_kind('enum')
+
+    @property
+    def interfaces(self):
+        return self.of_kind('interface')
+
+    @property
+    def scalars(self):
+        used = {f.type_name for t in self.types.values() for f in t.fields.values()}
+        return sorted((used & set(SCALARS)) | set(self.of_kind('scalar')))
+
+    @property
+    def derived_links(self):
+        # (entity, field, target entity, target field) for every @derivedFrom reverse lookup.
+        return [
+            (t.name, f.name, f.type_name, f.derived_from)
+            for t in self.types.values() for f in t.fields.values() if f.derived_from
+        ]
+
+    def field(self, type_name, field_name):
+        schema_type = self.types.get(type_name)
+        if schema_type:
+            return schema_type.fields.get(field_name)
+
+    def implementations(self, interface):
+        return [t.name for t in self.types.values() if interface in t.interfaces]
+
+
+class SDLParser(Parser):
+    def skip_description(self):
+        while self.peek() and self.peek()[0] == 'string':
+            self.next()
+
+    def parse_directives(self):
+        directives = {}
+        while self.peek('@'):
+            self.next()
+            name = self.expect_name()
+            arguments = {}
+            if self.peek('('):
+                self.next()
+                while not self.peek(')'):
+                    key = self.expect_name()
+                    self.expect(':')
+                    arguments[key] = self.parse_value()
+                self.next()
+            directives[name] = arguments
+        return directives
+
+    def parse_schema(self):
+        types = {}
+        while True:
+            self.skip_description()
+            if self.peek() is None:
+                return types
+            keyword = self.expect_name()
+            name = self.expect_name()
+            if keyword == 'scalar':
+                types[name] = SchemaType(name, 'scalar', directives=self.parse_directives())
+            elif keyword == 'union':
+                directives = self.parse_directives()
+                self.expect('=')
+                if self.peek('|'):
+                    self.next()
+                members = [self.expect_name()]
+                while self.peek('|'):
+                    self.next()
+                    members.append(self.expect_name())
+                types[name] = SchemaType(name, 'union', values=members, directives=directives)
+            elif keyword == 'enum':
+                directives = self.parse_directives()
+                self.expect('{')
+                values = []
+                while not self.peek('}'):
+                    self.skip_description()
+                    values.append(self.expect_name())
+                    self.parse_directives()
+                self.next()
+                types[name] = SchemaType(name, 'enum', values=values, directives=directives)
+            elif keyword in ('type', 'interface', 'input'):
+                interfaces = []
+                if self.peek('implements'):
+                    self.next()
+                    if self.peek('&'):
+                        self.next()
+                    interfaces.append(self.expect_name())
+                    while self.peek('&'):
+                        self.next()
+                        interfaces.append(self.expect_name())
+                directives = self.parse_directives()
+                types[name] = SchemaType(name, keyword, self.parse_fields(), interfaces=interfaces, directives=directives)
+            else:
+                raise GraphQLSyntaxError('Unknown definition %r' % keyword)
+
+    def parse_fields(self):
+        fields = {}
+        self.expect('{')
+        while not self.peek('}'):
+            self.skip_description()
+            name = self.expect_name()
+            if self.peek('('):
+                self.next()
+                depth = 1
+                while depth:
+                    depth += {'(': 1, ')': -1}.get(self.next()[1], 0)
+            self.expect(':')
+            field = fields[name] = self.parse_type(name)
+            field.derived_from = self.parse_directives().get('derivedFrom', {}).get('field')
+        self.next()
+        return fields
+
+    def parse_type(self, name):
+        is_list = False
+        if self.peek('['):
+            self.next()
+            is_list = True
+            type_name = self.expect_name()
+            text = type_name
+            if self.peek('!'):
+                self.next()
+                text += '!'
+            self.expect(']')
+            text = '[%s]' % text
+        else:
+            type_name = text = self.expect_name()
+        non_null = bool(self.peek('!'))
+        if non_null:
+            self.next()
+            text += '!'
+        return SchemaField(name, type_name, is_list, non_null, text)
+
+
+def parse_sdl(text):
+    return SDLParser(text).parse_schema()
+
+def references(types):
+    return {
+        name: {f.type_name for f in schema_type.fields.values() if f.type_name in types}
+        for name, schema_type in types.items()
+    }
+
+def render_type(schema_type, scalars_only=False, types=None):
+    if schema_type.kind == 'enum':
+        return 'enum %s { %s }' % (schema_type.name, ' '.join(schema_type.values))
+    if schema_type.kind in ('scalar', 'union'):
+        return '%s %s' % (schema_type.kind, schema_type.name)
+    lines = []
+    for field in schema_type.fields.values():
+        if scalars_only and field.type_name not in SCALARS:
+            related = types and types.get(field.type_name)
+            if not related or related.kind != 'enum':
+                continue
+        lines.append('  %s: %s' % (field.name, field.type))
+    return '%s %s {\n%s\n}' % (schema_type.kind, schema_type.name, '\n'.join(lines))
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.graphql import GraphQLSyntaxError, parse
+from utils.limiter import TokenBucket
+
+# Rows may carry the block they landed in under this key, it is never sent back.
+BLOCK_KEY = '_block'
+
+OPERATORS = {
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+    'not': lambda a, b: a != b,
+    'in': lambda a, b: a in b,
+}
+
+
+def sort_key(value):
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+def matches(row, where):
+    # Enough of the subgraph filter language for scalar comparisons on canned rows.
+    for key, expected in where.items():
+        name, _, operator = key.rpartition('_')
+        if operator not in OPERATORS or name not in row:
+            name, operator = key, None
+        value = row.get(name)
+        if operator is None:
+            if sort_key(value) != sort_key(expected):
+                return False
+        elif operator == 'in':
+            if sort_key(value) not in [sort_key(v) for v in expected]:
+                return False
+        elif not OPERATORS[operator](sort_key(value), sort_key(expected)):
+            return False
+    return True
+
+
+class StandInSubgraph:
+    # Local HTTP stand-in for a subgraph endpoint, serving canned rows per root field.
+
+    # rate_limit and max_concurrency make it answer 429 with Retry-After like a throttling gateway,
+    # load_latency adds that many seconds per other request in flight.
+
+    def __init__(self, entities=None, handler=None, latency=0.0, block=1, rate_limit=None, max_concurrency=None,
+                 retry_after=1, load_latency=0.0):
+        self.entities = entities or {}
+        self.handler = handler or self.answer
+        self.latency = latency
+        self.block = block
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.load_latency = load_latency
+        self.bucket = TokenBucket(rate_limit, rate_limit) if rate_limit else None
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    def answer(self, query):
+        try:
+            document = parse(query)
+        except GraphQLSyntaxError as e:
+            return 200, {'errors': [{'message': str(e)}]}
+        data = {}
+        latest = self.block
+        for field in document.fields:
+            arguments = field.arguments
+            block = (arguments.get('block') or {}).get('number', latest)
+            if block > latest:
+                return 200, {'errors': [{'message': 'Failed to decode `block.number` value: subgraph has only indexed up to block number %d and data for block number %d is therefore not yet available' % (latest, block)}]}
+            if field.name == '_meta':
+                data[field.key] = {'block': {'number': block, 'hash': '0x%064x' % block}, 'hasIndexingErrors': False}
+                continue
+            rows = [
+                {k: v for k, v in row.items() if k != BLOCK_KEY}
+                for row in self.entities.get(field.name, []) if row.get(BLOCK_KEY, 0) <= block
+            ]
+            rows = [row for row in rows if matches(row, arguments.get('where') or {})]
+            if 'orderBy' in arguments:
+                rows = sorted(rows, key=lambda row: sort_key(row.get(arguments['orderBy'])),
+                              reverse=arguments.get('orderDirection') == 'desc')
+            skip = arguments.get('skip', 0)
+            data[field.key] = rows[skip:skip + arguments.get('first', 100)]
+        return 200, {'data': data}
+
+    def advance(self, entities=None, blocks=1):
+        # Moves the head forward, new rows only show up for queries reading the new blocks.
+        with self._lock:
+            self.block += blocks
+            for name, rows in (entities or {}).items():
+                self.entities.setdefault(name, []).extend(dict(row, **{BLOCK_KEY: self.block}) for row in rows)
+        return self.block
+
+    def handle(self, query):
+        with self._lock:
+            self.requests += 1
+            throttled = (self.max_concurrency is not None and self.in_flight >= self.max_concurrency) or (
+                self.bucket is not None and not self.bucket.try_acquire())
+            if throttled:
+                self.throttled += 1
+                return 429, ({'errors': [{'message': 'Too many requests'}]}, {'Retry-After': str(self.retry_after)})
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            others = self.in_flight - 1
+        try:
+            if self.latency or self.load_latency:
+                time.sleep(self.latency + self.load_latency * others)
+            return self.handler(query)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                query = json.loads(body or b'{}').get('query', '')
+                status, payload = stand_in.handle(query)
+                headers = {}
+                if isinstance(payload, tuple):
+                    payload, headers = payload
+                content = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,13 +1,210 @@
+import asyncio
+import functools
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from flatten_json import flatten
+from utils.graphql import Enum, Field, GraphQLSyntaxError, parse, render
+from utils.limiter import LIMITERS
+from utils.tracing import TRACER
 
-def post_query(url, query):
-    response = requests.post(url, '', json={'query':query})
-    if response.status_code == 200:
-        return response.json()
+PAGE_SIZE = 1000
+CURSOR_FIELDS = ('id', 'timestamp', 'blockNumber')
+
+TIMEOUT = (5, 30)
+MAX_RETRIES = 3
+BACKOFF = 0.5
+MAX_BACKOFF = 8
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POOL_SIZE = 10
+META_QUERY = '{ _meta { block { number } } }'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class QueryError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+def get_session(url):
+    # One keep-alive session per endpoint so repeated queries skip the TCP and TLS handshakes.
+    with _sessions_lock:
+        session = _sessions.get(url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[url] = session
+    return session
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))
+
+def current_block(url, timeout=TIMEOUT, retries=MAX_RETRIES):
+    # Latest block the indexer has processed, never cached since it moves with every new block.
+    result = post_query(url, META_QUERY, timeout, retries)
+    try:
+        return int(result['data']['_meta']['block']['number'])
+    except (KeyError, TypeError, ValueError):
+        raise QueryError('Could not resolve the indexed block: %s' % (result,), result)
+
+def pin_query(query, block):
+    document = parse(query)
+    for field in document.fields:
+        field.arguments['block'] = {'number': block}
+    return render(document)
+
+def post_query(url, query, timeout=TIMEOUT, retries=MAX_RETRIES, cache=None, block=None):
+    if block is not None:
+        # Every root field reads the same block, so the response is immutable and cached without expiry.
+        try:
+            query = pin_query(query, block)
+        except GraphQLSyntaxError as e:
+            return {'errors': [{'message': str(e)}]}
+    if cache is not None:
+        result = cache.get(url, query)
+        if result is None:
+            result = post_query(url, query, timeout, retries)
+            if 'data' in result and not result.get('errors'):
+                cache.set(url, query, result)
+        return result
+    with TRACER.span('http', endpoint=url) as span:
+        return send_query(get_session(url), url, query, timeout, retries, span)
+
+def send_query(session, url, query, timeout, retries, span):
+    for attempt in range(retries + 1):
+        try:
+            # Waits for the endpoint's rate and adaptive concurrency limits, the status feeds them back.
+            with LIMITERS.slot(url) as slot:
+                response = session.post(url, json={'query':query}, timeout=timeout)
+                slot.status = response.status_code
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                return {'errors': [{'message': 'Request failed: %s' % e}]}
+            time.sleep(backoff_delay(attempt))
+            continue
+        span.set(bytes=len(response.content), status=response.status_code)
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return {'errors': [{'message': 'HTTP %d: %s' % (response.status_code, response.text[:200])}]}
+        delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+        if response.status_code == 429:
+            # Every caller of this endpoint holds off, not just the one that was throttled.
+            LIMITERS.pause(url, delay)
+        time.sleep(delay)
+
+async def apost_query(url, query, executor=None, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(post_query, url, query, **kwargs))
+
+def paginate_query(url, query, limit=None, page_size=PAGE_SIZE, snapshot=False, block=None, cache=None):
+    document = parse(query)
+    if len(document.fields) != 1:
+        raise ValueError('Pagination needs exactly one root field, got %d' % len(document.fields))
+    root = document.fields[0]
+    args = root.arguments
+    if limit is None:
+        limit = args.get('first')
+    if block is None and snapshot:
+        # Resolved once, every page then reads the same block and new rows cannot shift the cursor.
+        block = current_block(url)
+
+    # Time ordered entities keep their ordering and page on it, anything else pages by id.
+    cursor = args.get('orderBy') if args.get('orderBy') in CURSOR_FIELDS else 'id'
+    descending = args.get('orderDirection') == 'desc'
+    direction = 'desc' if descending else 'asc'
+    strict = '_lt' if descending else '_gt'
+    # Several rows can share a timestamp, so re-read the boundary value and drop seen ids.
+    operator = strict if cursor == 'id' else strict + 'e'
+
+    injected = []
+    for name in dict.fromkeys(('id', cursor)):
+        if not root.field(name):
+            root.selections.append(Field(name))
+            injected.append(name)
+
+    where = dict(args.get('where') or {})
+    args.pop('skip', None)
+    fetched = 0
+
+    def fetch(page_where, order_by, order_direction, first):
+        args['where'] = page_where
+        args['orderBy'] = Enum(order_by)
+        args['orderDirection'] = Enum(order_direction)
+        args['first'] = first
+        result = post_query(url, render(document), cache=cache, block=block)
+        data = result.get('data') if isinstance(result, dict) else None
+        if not isinstance(data, dict):
+            raise QueryError('Page request failed: %s' % (result,), result)
+        return data.get(root.key) or []
+
+    def take(rows, seen):
+        nonlocal fetched
+        page = [row for row in rows if row['id'] not in seen]
+        if limit is not None:
+            page = page[:limit - fetched]
+        fetched += len(page)
+        if injected:
+            # New rows, the originals may be shared with the response cache.
+            page = [{k: v for k, v in row.items() if k not in injected} for row in page]
+        return page
+
+    last = None
+    seen = set()
+    past = False
+    while limit is None or fetched < limit:
+        first = page_size if limit is None else min(page_size, limit - fetched)
+        page_where = dict(where)
+        if last is not None:
+            page_where[cursor + (strict if past else operator)] = last
+        rows = fetch(page_where, cursor, direction, first)
+        tied = cursor != 'id' and len(rows) == first and rows[0][cursor] == rows[-1][cursor]
+        if rows:
+            value = rows[-1][cursor]
+            boundary = {row['id'] for row in rows if row[cursor] == value}
+            if tied and value == last:
+                boundary |= seen
+        page = take(rows, seen)
+        if rows:
+            last, seen, past = value, boundary, False
+        if page:
+            yield page
+        if len(rows) < first:
+            break
+        if not tied:
+            continue
+
+        # A full page shares one value, the cursor cannot move past it, so read that value by id.
+        last_id = None
+        while limit is None or fetched < limit:
+            first = page_size if limit is None else min(page_size, limit - fetched)
+            tied_where = dict(where, **{cursor: last})
+            if last_id is not None:
+                tied_where['id_gt'] = last_id
+            rows = fetch(tied_where, 'id', 'asc', first)
+            page = take(rows, seen)
+            if page:
+                yield page
+            if len(rows) < first:
+                break
+            last_id = rows[-1]['id']
+        seen, past = set(), True
 
 def parse_results(results):
     new_results = []
-    for result in results:
-        new_results.append(flatten(result))
+    with TRACER.span('parse_results', rows=len(results)):
+        for result in results:
+            new_results.append(flatten(result))
     return new_results
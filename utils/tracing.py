@@ -0,0 +1,201 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from utils.schema_model import load_schema
+from utils.schemas import SCHEMAS
+from utils.urls import URLS
+from utils.validator import root_fields
+
+PREFIX = 'ai_graph_stage'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+OTHER = 'other'
+
+
+@functools.lru_cache(maxsize=None)
+def known_entities(protocol):
+    return frozenset(root_fields(load_schema(protocol)))
+
+def metric_labels(labels):
+    # Histogram series only take label values from known sets, anything else counts as 'other'.
+    # The raw values stay on the span, in the trace and in the JSON lines.
+    protocol = labels.get('protocol')
+    endpoints = {url: name for name, url in URLS.items()}
+    bounded = {}
+    for key, value in labels.items():
+        if key == 'protocol':
+            value = value if value in URLS else OTHER
+        elif key == 'endpoint':
+            value = endpoints.get(value, OTHER)
+        elif key == 'entity':
+            known = known_entities(protocol) if protocol in SCHEMAS else ()
+            value = value if value and all(part in known for part in value.split('+')) else OTHER
+        elif key == 'status':
+            value = value[0] + 'xx' if len(value) == 3 and value.isdigit() else OTHER
+        bounded[key] = value
+    return tuple(sorted(bounded.items()))
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = {}
+        self.bytes = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.offset = 0.0
+        self.error = None
+        self.set(**labels)
+
+    def set(self, bytes=None, rows=None, **labels):
+        if bytes is not None:
+            self.bytes = bytes
+        if rows is not None:
+            self.rows = rows
+        self.labels.update((key, str(value)) for key, value in labels.items() if value is not None)
+        return self
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'labels': self.labels,
+            'ms': round(self.seconds * 1000, 3),
+            'offset_ms': round(self.offset * 1000, 3),
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'error': self.error,
+        }
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def rows(self):
+        return [span.as_dict() for span in self.spans]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.errors = 0
+
+
+class Tracer:
+    # Spans around each stage, aggregated into latency histograms per stage and bounded label set.
+    # Finished spans are also appended as JSON lines to jsonl_path when it is set.
+
+    def __init__(self, buckets=BUCKETS, jsonl_path=None):
+        self.buckets = buckets
+        self.jsonl_path = jsonl_path
+        self.histograms = {}
+        self.last_trace = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def start_trace(self, name):
+        trace = self._local.trace = Trace(name)
+        return trace
+
+    def finish_trace(self):
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.seconds = time.perf_counter() - trace.started
+            self._local.trace = None
+            with self._lock:
+                self.last_trace = trace
+        return trace
+
+    @contextlib.contextmanager
+    def trace(self, name):
+        trace = self.start_trace(name)
+        try:
+            yield trace
+        finally:
+            self.finish_trace()
+
+    @contextlib.contextmanager
+    def span(self, name, **labels):
+        span = Span(name, labels)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            self.record(span, start)
+
+    def record(self, span, start):
+        trace = getattr(self._local, 'trace', None)
+        key = (span.name, metric_labels(span.labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            for index, bound in enumerate(self.buckets):
+                if span.seconds <= bound:
+                    histogram.counts[index] += 1
+            histogram.count += 1
+            histogram.sum += span.seconds
+            histogram.bytes += span.bytes
+            histogram.rows += span.rows
+            histogram.errors += span.error is not None
+            if trace is not None:
+                span.offset = start - trace.started
+                trace.spans.append(span)
+        if self.jsonl_path:
+            # Written outside the histogram lock, only writers wait for each other.
+            line = json.dumps(dict(span.as_dict(), time=time.time(), trace=trace.name if trace else None)) + '\n'
+            with self._write_lock, open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def prometheus(self):
+        # Prometheus text exposition format, one series per stage and label set.
+        with self._lock:
+            items = sorted(self.histograms.items())
+            lines = [
+                '# HELP %s_seconds Time spent in each pipeline stage.' % PREFIX,
+                '# TYPE %s_seconds histogram' % PREFIX,
+            ]
+            for (name, labels), histogram in items:
+                base = [('stage', name)] + list(labels)
+                for bound, count in zip(self.buckets, histogram.counts):
+                    lines.append('%s_seconds_bucket%s %d' % (PREFIX, render_labels(base + [('le', repr(bound))]), count))
+                lines.append('%s_seconds_bucket%s %d' % (PREFIX, render_labels(base + [('le', '+Inf')]), histogram.count))
+                lines.append('%s_seconds_sum%s %.6f' % (PREFIX, render_labels(base), histogram.sum))
+                lines.append('%s_seconds_count%s %d' % (PREFIX, render_labels(base), histogram.count))
+            for metric, attribute, text in (('bytes', 'bytes', 'Payload bytes'), ('rows', 'rows', 'Rows'),
+                                            ('errors', 'errors', 'Failed spans')):
+                lines.append('# HELP %s_%s_total %s per pipeline stage.' % (PREFIX, metric, text))
+                lines.append('# TYPE %s_%s_total counter' % (PREFIX, metric))
+                for (name, labels), histogram in items:
+                    lines.append('%s_%s_total%s %d' % (PREFIX, metric, render_labels([('stage', name)] + list(labels)),
+                                                       getattr(histogram, attribute)))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.last_trace = None
+
+
+def render_labels(labels):
+    escaped = ('%s="%s"' % (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for key, value in labels)
+    return '{%s}' % ','.join(escaped)
+
+
+# TRACE_JSONL=spans.jsonl appends every finished span to that file.
+TRACER = Tracer(jsonl_path=os.environ.get('TRACE_JSONL'))
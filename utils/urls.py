@@ -1,3 +1,6 @@
+import json
+import os
+
 URLS = {
     'uniswap': 'https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-ethereum',
     'balancer': 'https://api.thegraph.com/subgraphs/name/balancer-labs/balancer',
@@ -5,3 +8,13 @@ URLS = {
     'opensea' : 'https://api.thegraph.com/subgraphs/name/messari/opensea-v2-ethereum',
     'aave' : 'https://api.thegraph.com/subgraphs/name/aave/protocol-v3'
 }
+
+
+def override_urls(mapping):
+    # Updated in place so modules holding a reference to URLS see the change; returns the replaced entries.
+    previous = {protocol: URLS.get(protocol) for protocol in mapping}
+    URLS.update(mapping)
+    return previous
+
+# GRAPH_URLS='{"uniswap": "http://127.0.0.1:8000/"}' points protocols at another endpoint, e.g. a local stand-in.
+override_urls(json.loads(os.environ.get('GRAPH_URLS') or '{}'))
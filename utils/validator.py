@@ -0,0 +1,215 @@
+import difflib
+import functools
+from utils.graphql import Enum, Field, GraphQLSyntaxError, InlineFragment, parse, render
+from utils.schema_model import load_schema
+from utils.sdl import SCALARS
+
+COLLECTION_ARGUMENTS = ('first', 'skip', 'orderBy', 'orderDirection', 'where', 'block', 'subgraphError')
+SINGLE_ARGUMENTS = ('id', 'block', 'subgraphError')
+NESTED_ARGUMENTS = ('first', 'skip', 'orderBy', 'orderDirection', 'where')
+FILTER_SUFFIXES = (
+    '_not_contains_nocase', '_not_starts_with_nocase', '_not_ends_with_nocase',
+    '_contains_nocase', '_starts_with_nocase', '_ends_with_nocase',
+    '_not_starts_with', '_not_ends_with', '_not_contains', '_starts_with', '_ends_with',
+    '_contains', '_not_in', '_gte', '_lte', '_not', '_gt', '_lt', '_in', '_',
+)
+META_FIELD = '_meta'
+
+
+class QueryIssue:
+    def __init__(self, path, message, suggestion=None, fix=None):
+        self.path = path
+        self.message = message
+        self.suggestion = suggestion
+        self.fix = fix
+        self.document = None
+
+    def __str__(self):
+        text = '%s: %s' % (self.path, self.message)
+        if self.suggestion:
+            text += " (did you mean '%s'?)" % self.suggestion
+        return text
+
+    __repr__ = __str__
+
+
+def lower_first(name):
+    if name.isupper():
+        return name.lower()
+    return name[:1].lower() + name[1:]
+
+def plural(name):
+    if name.endswith('y') and name[-2:-1] not in 'aeiou':
+        return name[:-1] + 'ies'
+    if name.endswith(('s', 'x', 'ch', 'sh')):
+        return name + 'es'
+    return name + 's'
+
+@functools.lru_cache(maxsize=None)
+def root_fields(schema):
+    roots = {}
+    for name, schema_type in schema.types.items():
+        if schema_type.kind not in ('type', 'interface'):
+            continue
+        single = lower_first(name)
+        roots[single] = (name, False)
+        roots[plural(single)] = (name, True)
+    return roots
+
+def nearest(name, candidates):
+    matches = difflib.get_close_matches(name, list(candidates), n=1, cutoff=0.6)
+    return matches[0] if matches else None
+
+def filter_field(key):
+    if key in ('and', 'or'):
+        return None
+    for suffix in FILTER_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            return key[:-len(suffix)]
+    return key
+
+def validate_query(protocol, query):
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError as e:
+        return [QueryIssue('query', str(e))]
+    if not document.selections:
+        return [QueryIssue('query', 'no fields selected')]
+    issues = []
+    check_document(load_schema(protocol), document, issues)
+    for issue in issues:
+        issue.document = document
+    return issues
+
+def rename(field):
+    return lambda name: setattr(field, 'name', name)
+
+def set_argument(arguments, key, rest=''):
+    return lambda name: arguments.__setitem__(key, Enum(name + rest))
+
+def rename_key(mapping, key, suffix):
+    def fix(name):
+        items = [(name + suffix if k == key else k, v) for k, v in mapping.items()]
+        mapping.clear()
+        mapping.update(items)
+    return fix
+
+def check_document(schema, document, issues):
+    roots = root_fields(schema)
+    for field in document.selections:
+        if not isinstance(field, Field):
+            issues.append(QueryIssue('query', 'fragments are not allowed at the root'))
+            continue
+        if field.name == META_FIELD:
+            continue
+        if field.name not in roots:
+            # Collection arguments point at the plural root, an id at the singular one.
+            candidates = roots
+            if any(name not in SINGLE_ARGUMENTS for name in field.arguments):
+                candidates = [name for name, (_, is_list) in roots.items() if is_list]
+            elif 'id' in field.arguments:
+                candidates = [name for name, (_, is_list) in roots.items() if not is_list]
+            suggestion = nearest(field.name, candidates)
+            issues.append(QueryIssue(field.key, "unknown entity '%s'" % field.name, suggestion, rename(field)))
+            continue
+        type_name, is_list = roots[field.name]
+        check_arguments(schema, type_name, field, COLLECTION_ARGUMENTS if is_list else SINGLE_ARGUMENTS, issues)
+        check_selections(schema, type_name, field, field.key, issues)
+
+def check_arguments(schema, type_name, field, allowed, issues):
+    fields = schema.types[type_name].fields if type_name in schema.types else None
+    for name, value in field.arguments.items():
+        path = '%s(%s)' % (field.key, name)
+        if name not in allowed:
+            issues.append(QueryIssue(path, "unknown argument '%s'" % name, nearest(name, allowed)))
+        elif fields is None:
+            continue
+        elif name == 'orderBy' and isinstance(value, Enum):
+            base = value.split('__')[0]
+            if base not in fields:
+                issues.append(QueryIssue(path, "'%s' is not a field of %s" % (value, type_name), nearest(base, fields),
+                                         set_argument(field.arguments, name, value[len(base):])))
+        elif name == 'orderDirection' and value not in ('asc', 'desc'):
+            suggestion = 'desc' if str(value).lower().startswith('desc') else 'asc'
+            issues.append(QueryIssue(path, "orderDirection must be asc or desc", suggestion,
+                                     set_argument(field.arguments, name)))
+        elif name == 'where' and isinstance(value, dict):
+            check_filter(schema, type_name, value, path, issues)
+
+def check_filter(schema, type_name, where, path, issues):
+    fields = schema.types[type_name].fields
+    for key, value in where.items():
+        if key in ('and', 'or'):
+            for nested in value if isinstance(value, list) else [value]:
+                if isinstance(nested, dict):
+                    check_filter(schema, type_name, nested, path, issues)
+            continue
+        if key == '_change_block':
+            continue
+        base = filter_field(key)
+        if base not in fields:
+            issues.append(QueryIssue(path, "cannot filter %s on '%s'" % (type_name, key), nearest(base, fields),
+                                     rename_key(where, key, key[len(base):])))
+        elif key.endswith('_') and isinstance(value, dict) and fields[base].type_name in schema.types:
+            check_filter(schema, fields[base].type_name, value, path, issues)
+
+def check_selections(schema, type_name, field, path, issues):
+    schema_type = schema.types.get(type_name)
+    if schema_type is None:
+        # Referenced type that is not part of the embedded SDL, nothing to check against.
+        return
+    if schema_type.kind == 'enum':
+        if field.selections:
+            issues.append(QueryIssue(path, '%s is an enum and takes no selection' % type_name))
+        return
+    if not field.selections:
+        issues.append(QueryIssue(path, '%s is an object and needs a selection of fields' % type_name, 'id',
+                                 lambda name: field.selections.append(Field(name))))
+        return
+    for selection in field.selections:
+        if isinstance(selection, InlineFragment):
+            if selection.type_condition not in schema.types:
+                issues.append(QueryIssue(path, "unknown type '%s'" % selection.type_condition,
+                                         nearest(selection.type_condition, schema.types)))
+            else:
+                fragment = Field(type_name, selections=selection.selections)
+                check_selections(schema, selection.type_condition, fragment, path, issues)
+            continue
+        child_path = '%s.%s' % (path, selection.key)
+        if selection.name == '__typename':
+            continue
+        definition = schema_type.fields.get(selection.name)
+        if definition is None:
+            suggestion = nearest(selection.name, schema_type.fields)
+            issues.append(QueryIssue(child_path, "%s has no field '%s'" % (type_name, selection.name), suggestion,
+                                     rename(selection)))
+            continue
+        if definition.type_name in SCALARS or (
+            definition.type_name in schema.types and schema.types[definition.type_name].kind == 'enum'
+        ):
+            if selection.selections:
+                issues.append(QueryIssue(child_path, "'%s' is a %s and takes no selection" % (selection.name, definition.type_name)))
+            if selection.arguments:
+                issues.append(QueryIssue(child_path, "'%s' takes no arguments" % selection.name))
+            continue
+        allowed = NESTED_ARGUMENTS if definition.is_list else ()
+        check_arguments(schema, definition.type_name, selection, allowed, issues)
+        check_selections(schema, definition.type_name, selection, child_path, issues)
+
+def repair_query(protocol, query, rounds=3):
+    # Applies the nearest-name suggestions; returns the repaired query and whatever is still wrong.
+    issues = validate_query(protocol, query)
+    schema = load_schema(protocol)
+    for _ in range(rounds):
+        fixable = [issue for issue in issues if issue.fix is not None and issue.suggestion]
+        if not fixable:
+            break
+        for issue in fixable:
+            issue.fix(issue.suggestion)
+        document = fixable[0].document
+        query = render(document)
+        issues = []
+        check_document(schema, document, issues)
+        for issue in issues:
+            issue.document = document
+    return query, issues